@@ -17,6 +17,7 @@ CONFIG_PATH = f"{CODE_PATH}/config"
 MODELS_PATH = f"{DATA_PATH}/models"
 CHECKPOINTS_PATH = f"{DATA_PATH}/checkpoints"
 SETS_PATH = f"{DATA_PATH}/sets"
+INDUCTOR_CACHE_PATH = f"{DATA_PATH}/inductor_cache"
 
 SALICON_PATH = f"{DATA_PATH}/salicon"
 RAW_SALICON_PATH = f"{SALICON_PATH}/raw"
@@ -55,6 +56,7 @@ VIEWOUT_FRAME_HEIGHT = 3072
 VIEWOUT_FRAME_WIDTH = 6144
 SEQUENCE_LENGTH = 5
 N_WORKERS = 4
+PROGRESS_BAR_REFRESH_RATE = 16
 
 SEED = 0
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
\ No newline at end of file
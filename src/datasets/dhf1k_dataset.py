@@ -4,17 +4,21 @@ from pathlib import Path
 GLOBAL_DIR = Path(__file__).parent / ".." / ".."
 sys.path.append(str(GLOBAL_DIR))
 
+import os
+import json
 import torch
-import random
 import numpy as np
-from PIL import Image
 from natsort import natsorted
 import lightning.pytorch as pl
+from torchvision import tv_tensors
+from torchvision.transforms import v2
 from typing import List, Tuple, Optional
 from torch.utils.data import Dataset, DataLoader
-from torchvision.transforms import functional as TF
+from torch.utils.data.dataloader import default_collate
+from torchvision.io import read_file, read_image, decode_jpeg, ImageReadMode
 
 from src.utils.random import set_seed
+from src.datasets.prefetcher import get_prefetched_dataloader
 from src.utils.file import get_paths_recursive
 from src.config import SEQUENCE_LENGTH, IMAGE_SIZE
 
@@ -23,175 +27,225 @@ class DHF1KDataset(Dataset):
     def __init__(
         self,
         sample_folder_paths: List[str],
-        with_transforms: bool,
+        decode_on_device: bool = False,
+        with_cache: bool = False,
     ) -> None:
+        if decode_on_device and with_cache:
+            raise ValueError("❌ Cannot decode on device when using the cached frames.")
+
         super(DHF1KDataset, self).__init__()
 
         self.sample_folder_paths = sample_folder_paths
-        self.with_transforms = with_transforms
-        self.samples = self._get_samples()
+        self.decode_on_device = decode_on_device
+        self.with_cache = with_cache
+        self.video_paths, self.frame_counts, self.sample_offsets = self._get_samples()
+        self.resize = v2.Resize((IMAGE_SIZE, IMAGE_SIZE), antialias=True)
+
+        # Memory maps are opened lazily in each worker
+        self.caches = {}
+        if with_cache:
+            for video_path in self.video_paths:
+                DHF1KDataset.materialize_cache(video_path)
+
+    def __getstate__(self) -> dict:
+        # Do not pickle opened memory maps to the workers, this would copy their whole content
+        state = self.__dict__.copy()
+        state["caches"] = {}
+
+        return state
+
+    @staticmethod
+    def _get_file_paths(sample_folder_path: str) -> Tuple[List[str], List[str]]:
+        # Get frames and ground truth paths
+        frames_folder_path = f"{sample_folder_path}/frames"
+        ground_truths_folder_path = f"{sample_folder_path}/ground_truths"
+        frames = get_paths_recursive(
+            folder_path=frames_folder_path, match_pattern="*_1.jpg", path_type="f"
+        )  # TODO: Only first frame for now
+        ground_truths = get_paths_recursive(
+            folder_path=ground_truths_folder_path,
+            match_pattern="ground_truth_*.jpg",
+            path_type="f",
+        )
 
-    def _get_samples(self) -> List[Tuple[List[str], List[str]]]:
-        samples = []
-        for sample_folder_path in self.sample_folder_paths:
-            # Get frames and ground truth paths
-            frames_folder_path = f"{sample_folder_path}/frames"
-            ground_truths_folder_path = f"{sample_folder_path}/ground_truths"
-            frames = get_paths_recursive(
-                folder_path=frames_folder_path, match_pattern="*_1.jpg", path_type="f"
-            )  # TODO: Only first frame for now
-            ground_truths = get_paths_recursive(
-                folder_path=ground_truths_folder_path,
-                match_pattern="ground_truth_*.jpg",
-                path_type="f",
+        # Sort frames and ground truths paths
+        frames = natsorted(frames)
+        ground_truths = natsorted(ground_truths)
+
+        # Remove any frames that do not have corresponding ground truth files. This mismatch
+        # typically occurs at the end of videos that have fractional-second durations (e.g.,
+        # a 5.5 second video will have frames for the full duration but ground truth only up
+        # to 5.0 seconds)
+        if len(frames) < len(ground_truths):
+            raise ValueError(
+                f"❌ The number of frames ({len(frames)}) is less than the number of ground truths ({len(ground_truths)}) for {sample_folder_path}."
+            )
+        frames = frames[: len(ground_truths)]
+
+        return frames, ground_truths
+
+    @staticmethod
+    def _get_cache_file_paths(sample_folder_path: str) -> Tuple[str, str]:
+        frames_cache_file_path = f"{sample_folder_path}/frames_{IMAGE_SIZE}.u8"
+        ground_truths_cache_file_path = f"{sample_folder_path}/ground_truths_{IMAGE_SIZE}.u8"
+
+        return frames_cache_file_path, ground_truths_cache_file_path
+
+    @staticmethod
+    def materialize_cache(sample_folder_path: str) -> None:
+        # Decode and resize all frames and ground truths of the video once, as raw uint8 files
+        cache_file_paths = DHF1KDataset._get_cache_file_paths(sample_folder_path)
+        if all(os.path.exists(cache_file_path) for cache_file_path in cache_file_paths):
+            return
+
+        frame_file_paths, ground_truth_file_paths = DHF1KDataset._get_file_paths(sample_folder_path)
+        resize = v2.Resize((IMAGE_SIZE, IMAGE_SIZE), antialias=True)
+        for file_paths, mode, cache_file_path in zip(
+            [frame_file_paths, ground_truth_file_paths],
+            [ImageReadMode.RGB, ImageReadMode.GRAY],
+            cache_file_paths,
+        ):
+            channels = 3 if mode == ImageReadMode.RGB else 1
+            temporary_cache_file_path = f"{cache_file_path}.tmp"
+            cache = np.memmap(
+                temporary_cache_file_path,
+                dtype=np.uint8,
+                mode="w+",
+                shape=(len(file_paths), channels, IMAGE_SIZE, IMAGE_SIZE),
+            )
+            for i, file_path in enumerate(file_paths):
+                cache[i] = resize(read_image(file_path, mode=mode)).numpy()
+            cache.flush()
+            del cache
+
+            # Only expose complete caches
+            os.replace(temporary_cache_file_path, cache_file_path)
+
+    @staticmethod
+    def load_index(sample_folder_paths: List[str]) -> dict:
+        # Frame counts are memoized in an index at the root of the videos, so that the frame folders are only
+        # walked the first time a video is seen. The index is removed with the processed data when reprocessing
+        frame_counts = {}
+        root_folder_paths = natsorted({str(Path(path).parent) for path in sample_folder_paths})
+        for root_folder_path in root_folder_paths:
+            index_file_path = f"{root_folder_path}/index.json"
+            index = {}
+            if os.path.exists(index_file_path):
+                with open(index_file_path, "r") as index_file:
+                    index = json.load(index_file)
+
+            # Walk the videos missing from the index, the frames are validated and truncated there
+            missing_sample_folder_paths = [
+                path
+                for path in sample_folder_paths
+                if str(Path(path).parent) == root_folder_path and Path(path).name not in index
+            ]
+            for sample_folder_path in missing_sample_folder_paths:
+                frames, _ = DHF1KDataset._get_file_paths(sample_folder_path)
+                index[Path(sample_folder_path).name] = len(frames)
+            if missing_sample_folder_paths:
+                temporary_index_file_path = f"{index_file_path}.{os.getpid()}.tmp"
+                with open(temporary_index_file_path, "w") as index_file:
+                    json.dump(index, index_file)
+                os.replace(temporary_index_file_path, index_file_path)
+
+            for video_name, frame_count in index.items():
+                frame_counts[f"{root_folder_path}/{video_name}"] = frame_count
+
+        return frame_counts
+
+    def _get_cache(self, video_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        if video_idx not in self.caches:
+            frames_cache_file_path, ground_truths_cache_file_path = DHF1KDataset._get_cache_file_paths(
+                self.video_paths[video_idx]
             )
+            # Copy-on-write mode gives writable arrays without ever modifying the files
+            frames_cache = np.memmap(frames_cache_file_path, dtype=np.uint8, mode="c")
+            ground_truths_cache = np.memmap(ground_truths_cache_file_path, dtype=np.uint8, mode="c")
+            self.caches[video_idx] = (
+                frames_cache.reshape(-1, 3, IMAGE_SIZE, IMAGE_SIZE),
+                ground_truths_cache.reshape(-1, IMAGE_SIZE, IMAGE_SIZE),
+            )
+
+        return self.caches[video_idx]
 
-            # Sort frames and ground truths paths
-            frames = natsorted(frames)
-            ground_truths = natsorted(ground_truths)
-
-            # Remove any frames that do not have corresponding ground truth files. This mismatch
-            # typically occurs at the end of videos that have fractional-second durations (e.g.,
-            # a 5.5 second video will have frames for the full duration but ground truth only up
-            # to 5.0 seconds)
-            if len(frames) < len(ground_truths):
-                raise ValueError(
-                    f"❌ The number of frames ({len(frames)}) is less than the number of ground truths ({len(ground_truths)}) for {sample_folder_path}."
-                )
-            frames = frames[: len(ground_truths)]
-
-            n_samples = len(frames) - SEQUENCE_LENGTH + 1
-            if n_samples <= 0:
+    def _get_samples(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        index = DHF1KDataset.load_index(self.sample_folder_paths)
+        video_paths = []
+        frame_counts = []
+        for sample_folder_path in self.sample_folder_paths:
+            frame_count = index[f"{Path(sample_folder_path).parent}/{Path(sample_folder_path).name}"]
+            if frame_count < SEQUENCE_LENGTH:
                 continue
 
-            for start_idx in range(n_samples):
-                end_idx = start_idx + SEQUENCE_LENGTH
-                sample = (frames[start_idx:end_idx], ground_truths[start_idx:end_idx])
-                samples.append(sample)
+            # Only store the number of frames per video, paths are rebuilt from the start index
+            video_paths.append(sample_folder_path)
+            frame_counts.append(frame_count)
+        frame_counts = np.array(frame_counts, dtype=np.int32)
+
+        # Get the index of the first sample of each following video, samples are found back from them
+        sample_offsets = np.cumsum(frame_counts - SEQUENCE_LENGTH + 1, dtype=np.int64)
 
-        return samples
+        return video_paths, frame_counts, sample_offsets
 
     def __len__(self) -> int:
-        return len(self.samples)
+        return int(self.sample_offsets[-1]) if len(self.sample_offsets) > 0 else 0
 
-    def _apply_transforms(
-        self,
-        frames: List[np.ndarray],
-        ground_truths: List[np.ndarray],
-    ) -> Tuple[np.ndarray, np.ndarray]:
-        if self.with_transforms:
-            do_hflip = random.random() > 0.5
-            do_vflip = random.random() > 1.0
-            do_rotate = random.random() > 1.0
-            do_zoom = random.random() > 1.0
-            angle = random.uniform(-15, 15) if do_rotate else 0
-            zoom_factor = random.uniform(1.0, 1.2)
-            brightness_factor = random.uniform(0.9, 1.1)
-            contrast_factor = random.uniform(0.9, 1.1)
-            saturation_factor = random.uniform(0.9, 1.1)
-            hue_factor = random.uniform(-0.05, 0.05)
-            do_blur = random.random() > 0.5
-            sigma = random.uniform(0.1, 0.5)
-
-            # Apply flips
-            if do_hflip:
-                transformed_frames = []
-                for frame in frames:
-                    frame = TF.hflip(frame)
-                    transformed_frames.append(frame)
-                frames = transformed_frames
-                transformed_ground_truths = []
-                for ground_truth in ground_truths:
-                    ground_truth = TF.hflip(ground_truth)
-                    transformed_ground_truths.append(ground_truth)
-                ground_truths = transformed_ground_truths
-            if do_vflip:
-                transformed_frames = []
-                for frame in frames:
-                    frame = TF.vflip(frame)
-                    transformed_frames.append(frame)
-                frames = transformed_frames
-                transformed_ground_truths = []
-                for ground_truth in ground_truths:
-                    ground_truth = TF.vflip(ground_truth)
-                    transformed_ground_truths.append(ground_truth)
-                ground_truths = transformed_ground_truths
-
-            # Apply rotation
-            if do_rotate:
-                transformed_frames = []
-                for frame in frames:
-                    frame = TF.rotate(frame, angle, fill=0)
-                    transformed_frames.append(frame)
-                frames = transformed_frames
-                transformed_ground_truths = []
-                for ground_truth in ground_truths:
-                    ground_truth = TF.rotate(ground_truth, angle, fill=0)
-                    transformed_ground_truths.append(ground_truth)
-                ground_truths = transformed_ground_truths
-
-            # Apply zoom
-            if do_zoom:
-                w, h = frame.size
-                crop_w = int(w / zoom_factor)
-                crop_h = int(h / zoom_factor)
-                left = (w - crop_w) // 2
-                top = (h - crop_h) // 2
-                frames = [TF.resized_crop(frame, top, left, crop_h, crop_w, (h, w)) for frame in frames]
-                ground_truths = [
-                    TF.resized_crop(gt, top, left, crop_h, crop_w, (h, w)) for gt in ground_truths
-                ]
-
-            # Apply color transforms
-            transformed_frames = []
-            for frame in frames:
-                frame = TF.adjust_brightness(frame, brightness_factor)
-                frame = TF.adjust_contrast(frame, contrast_factor)
-                frame = TF.adjust_saturation(frame, saturation_factor)
-                frame = TF.adjust_hue(frame, hue_factor)
-                if do_blur:
-                    frame = TF.gaussian_blur(frame, kernel_size=3, sigma=sigma)
-                transformed_frames.append(frame)
-            frames = transformed_frames
+    def process_clip(
+        self, frames: torch.Tensor, ground_truths: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        frames = self.resize(frames)
+        ground_truths = self.resize(ground_truths)
 
         return frames, ground_truths
 
     def __getitem__(
         self, index: int
-    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-        sample = self.samples[index]
-        frame_file_paths, ground_truth_file_paths = sample
-        sample_id = int(frame_file_paths[0].split("/")[-3])
-
-        # Get frames
-        frame_file_paths = natsorted(frame_file_paths)
-        frames = [Image.open(frame_file_path).convert("RGB") for frame_file_path in frame_file_paths]
-        frames = [TF.resize(frame, (IMAGE_SIZE, IMAGE_SIZE)) for frame in frames]
-
-        # Get ground truths
-        ground_truth_file_paths = natsorted(ground_truth_file_paths)
-        ground_truths = [
-            Image.open(ground_truth_file_path).convert("L") for ground_truth_file_path in ground_truth_file_paths
+    ) -> Tuple[torch.Tensor, torch.Tensor, int]:
+        if index < 0 or index >= len(self):
+            raise IndexError(f"❌ Index {index} out of range for {len(self)} samples.")
+        video_idx = int(np.searchsorted(self.sample_offsets, index, side="right"))
+        start_idx = index - (int(self.sample_offsets[video_idx - 1]) if video_idx > 0 else 0)
+        end_idx = start_idx + SEQUENCE_LENGTH
+        video_path = self.video_paths[video_idx]
+        sample_id = int(Path(video_path).name)
+
+        # Get already decoded and resized frames and ground truths, without copy
+        if self.with_cache:
+            frames_cache, ground_truths_cache = self._get_cache(video_idx)
+            frames = torch.from_numpy(frames_cache[start_idx:end_idx])
+            ground_truths = torch.from_numpy(ground_truths_cache[start_idx:end_idx])
+            frames, ground_truths = self.process_clip(frames, ground_truths)
+
+            return frames, ground_truths, sample_id
+
+        # Get frames and ground truths paths, named after their second in the video
+        frame_file_paths = [f"{video_path}/frames/{i}_1.jpg" for i in range(start_idx, end_idx)]
+        ground_truth_file_paths = [
+            f"{video_path}/ground_truths/ground_truth_{i}.jpg" for i in range(start_idx, end_idx)
         ]
-        ground_truths = [TF.resize(ground_truth, (IMAGE_SIZE, IMAGE_SIZE)) for ground_truth in ground_truths]
 
-        # Apply transforms
-        frames, ground_truths = self._apply_transforms(frames, ground_truths)
+        # Return the encoded files only, they are decoded once the batch is on the device
+        if self.decode_on_device:
+            frame_datas = [read_file(frame_file_path) for frame_file_path in frame_file_paths]
+            ground_truth_datas = [
+                read_file(ground_truth_file_path) for ground_truth_file_path in ground_truth_file_paths
+            ]
+            return frame_datas, ground_truth_datas, sample_id
 
-        # Convert to torch tensors
-        frames = [TF.to_tensor(frame).float() for frame in frames]
-        frames = torch.stack(frames, axis=0)
-        ground_truths = [TF.to_tensor(ground_truth).float() for ground_truth in ground_truths]
-        ground_truths = [
-            ground_truth / ground_truth.max() for ground_truth in ground_truths
-        ]
-        ground_truths = torch.stack(ground_truths, axis=0).squeeze(1)
+        # Decode and resize frames and ground truths directly into preallocated (T, C, H, W) and
+        # (T, H, W) uint8 tensors
+        frames = torch.empty((SEQUENCE_LENGTH, 3, IMAGE_SIZE, IMAGE_SIZE), dtype=torch.uint8)
+        ground_truths = torch.empty((SEQUENCE_LENGTH, IMAGE_SIZE, IMAGE_SIZE), dtype=torch.uint8)
+        for i, (frame_file_path, ground_truth_file_path) in enumerate(
+            zip(frame_file_paths, ground_truth_file_paths)
+        ):
+            frames[i] = self.resize(read_image(frame_file_path, mode=ImageReadMode.RGB))
+            ground_truths[i] = self.resize(read_image(ground_truth_file_path, mode=ImageReadMode.GRAY))[0]
 
-        # Get global ground truth
-        global_ground_truth = torch.mean(ground_truths, axis=0)
-        global_ground_truth = global_ground_truth / global_ground_truth.max()
+        frames, ground_truths = self.process_clip(frames, ground_truths)
 
-        return frames, ground_truths, global_ground_truth, sample_id
+        return frames, ground_truths, sample_id
 
 
 class DHF1KDataModule(pl.LightningDataModule):
@@ -205,7 +259,14 @@ class DHF1KDataModule(pl.LightningDataModule):
         with_transforms: bool,
         n_workers: int,
         seed: Optional[int] = None,
+        decode_on_device: bool = False,
+        with_cache: bool = False,
+        with_prefetcher: bool = False,
+        eps: float = 1e-7,
     ):
+        if decode_on_device and with_prefetcher:
+            raise ValueError("❌ Cannot prefetch batches when decoding on device.")
+
         super().__init__()
         self.sample_folder_paths = sample_folder_paths
         self.batch_size = batch_size
@@ -215,11 +276,23 @@ class DHF1KDataModule(pl.LightningDataModule):
         self.with_transforms = with_transforms
         self.n_workers = n_workers
         self.seed = seed
+        self.decode_on_device = decode_on_device
+        self.with_cache = with_cache
+        self.with_prefetcher = with_prefetcher
+        self.eps = eps
+        self.transforms = self._get_transforms()
 
         self.train_dataset: Optional[Dataset] = None
         self.val_dataset: Optional[Dataset] = None
         self.test_dataset: Optional[Dataset] = None
 
+    def prepare_data(self):
+        # Write the index and the caches from a single process before the datasets are created
+        DHF1KDataset.load_index(self.sample_folder_paths)
+        if self.with_cache:
+            for sample_folder_path in self.sample_folder_paths:
+                DHF1KDataset.materialize_cache(sample_folder_path)
+
     def setup(self, stage: Optional[str] = None):
         if not np.isclose(self.train_split + self.val_split + self.test_split, 1.0):
             raise ValueError(
@@ -247,43 +320,150 @@ class DHF1KDataModule(pl.LightningDataModule):
                 sample_folder_paths=[
                     self.sample_folder_paths[i] for i in train_indices
                 ],
-                with_transforms=self.with_transforms,
+                decode_on_device=self.decode_on_device,
+                with_cache=self.with_cache,
             )
             self.val_dataset = DHF1KDataset(
                 sample_folder_paths=[self.sample_folder_paths[i] for i in val_indices],
-                with_transforms=False,
+                decode_on_device=self.decode_on_device,
+                with_cache=self.with_cache,
             )
 
         if stage == "test" or stage is None:
             self.test_dataset = DHF1KDataset(
                 sample_folder_paths=[self.sample_folder_paths[i] for i in test_indices],
-                with_transforms=False,
+                decode_on_device=self.decode_on_device,
+                with_cache=self.with_cache,
             )
 
     def train_dataloader(self):
-        return DataLoader(
+        return get_prefetched_dataloader(
             self.train_dataset,
+            trainer=self.trainer,
+            with_prefetcher=self.with_prefetcher,
             batch_size=self.batch_size,
             num_workers=self.n_workers,
             pin_memory=True,
             persistent_workers=True,
+            prefetch_factor=4,
+            collate_fn=self._collate_encoded if self.decode_on_device else None,
             drop_last=True,
         )
 
     def val_dataloader(self):
-        return DataLoader(
+        return get_prefetched_dataloader(
             self.val_dataset,
+            trainer=self.trainer,
+            with_prefetcher=self.with_prefetcher,
             batch_size=self.batch_size,
             num_workers=self.n_workers,
             pin_memory=True,
             persistent_workers=True,
+            prefetch_factor=4,
+            collate_fn=self._collate_encoded if self.decode_on_device else None,
         )
 
     def test_dataloader(self):
-        return DataLoader(
+        return get_prefetched_dataloader(
             self.test_dataset,
+            trainer=self.trainer,
+            with_prefetcher=self.with_prefetcher,
             batch_size=self.batch_size,
             num_workers=self.n_workers,
             pin_memory=True,
             persistent_workers=True,
+            prefetch_factor=4,
+            collate_fn=self._collate_encoded if self.decode_on_device else None,
         )
+
+    def _get_transforms(self) -> Optional[v2.Compose]:
+        if not self.with_transforms:
+            return None
+
+        # The same random parameters are drawn once per call, so the whole clip and its
+        # ground truths are transformed consistently
+        return v2.Compose(
+            [
+                v2.RandomHorizontalFlip(p=0.5),
+                v2.ColorJitter(brightness=0.1, contrast=0.1, saturation=0.1, hue=0.05),
+                v2.RandomApply([v2.GaussianBlur(kernel_size=3, sigma=(0.1, 0.5))], p=0.5),
+            ]
+        )
+
+    @staticmethod
+    def _collate_encoded(
+        batch: List[Tuple[List[torch.Tensor], List[torch.Tensor], int]],
+    ) -> Tuple[List[List[torch.Tensor]], List[List[torch.Tensor]], torch.Tensor]:
+        # Encoded files have different lengths and cannot be stacked
+        frame_datas_list, ground_truth_datas_list, sample_ids = zip(*batch)
+
+        return list(frame_datas_list), list(ground_truth_datas_list), default_collate(sample_ids)
+
+    def _get_current_dataset(self) -> DHF1KDataset:
+        if self.trainer.training:
+            return self.train_dataset
+        if self.trainer.validating or self.trainer.sanity_checking:
+            return self.val_dataset
+
+        return self.test_dataset
+
+    def transfer_batch_to_device(self, batch, device: torch.device, dataloader_idx: int):
+        if not self.decode_on_device:
+            return super().transfer_batch_to_device(batch, device, dataloader_idx)
+
+        # Decode all frames and ground truths of the batch at once with nvJPEG, encoded files must stay on CPU
+        frame_datas_list, ground_truth_datas_list, sample_ids = batch
+        frames = decode_jpeg(
+            [frame_data for frame_datas in frame_datas_list for frame_data in frame_datas],
+            mode=ImageReadMode.RGB,
+            device=device,
+        )
+        ground_truths = decode_jpeg(
+            [ground_truth_data for ground_truth_datas in ground_truth_datas_list for ground_truth_data in ground_truth_datas],
+            mode=ImageReadMode.GRAY,
+            device=device,
+        )
+
+        # Process each clip as it would have been in the dataset
+        dataset = self._get_current_dataset()
+        clips = [
+            dataset.process_clip(
+                torch.stack(frames[i : i + SEQUENCE_LENGTH]),
+                torch.cat(ground_truths[i : i + SEQUENCE_LENGTH]),
+            )
+            for i in range(0, len(frames), SEQUENCE_LENGTH)
+        ]
+        frames, ground_truths = map(torch.stack, zip(*clips))
+
+        return frames, ground_truths, sample_ids.to(device, non_blocking=True)
+
+    def on_after_batch_transfer(self, batch, dataloader_idx: int):
+        # Batches are transferred as uint8 and only converted to float on the device
+        frames, ground_truths, sample_ids = batch
+
+        # Augment training clips on the device, with random parameters drawn once per clip
+        if self.transforms is not None and self.trainer is not None and self.trainer.training:
+            clips = [
+                self.transforms(tv_tensors.Image(clip_frames), tv_tensors.Mask(clip_ground_truths))
+                for clip_frames, clip_ground_truths in zip(frames, ground_truths)
+            ]
+            frames = torch.stack([clip_frames.as_subclass(torch.Tensor) for clip_frames, _ in clips])
+            ground_truths = torch.stack(
+                [clip_ground_truths.as_subclass(torch.Tensor) for _, clip_ground_truths in clips]
+            )
+
+        frames = frames.float().div_(255.0)
+
+        # Normalize ground truths
+        ground_truths = ground_truths.float()
+        ground_truths = ground_truths / (
+            ground_truths.amax(dim=(-2, -1), keepdim=True) + self.eps
+        )
+
+        # Get global ground truths
+        global_ground_truths = ground_truths.mean(dim=1)
+        global_ground_truths = global_ground_truths / (
+            global_ground_truths.amax(dim=(-2, -1), keepdim=True) + self.eps
+        )
+
+        return frames, ground_truths, global_ground_truths, sample_ids
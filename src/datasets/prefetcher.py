@@ -0,0 +1,163 @@
+import torch
+import lightning.pytorch as pl
+from typing import Any, Iterator, Optional
+from torch.utils.data import Dataset, DataLoader, DistributedSampler
+from lightning.fabric.utilities.apply_func import move_data_to_device
+
+
+class CUDAPrefetcher:
+    """
+    A data loader wrapper that copies the next batch to the GPU on a side stream, so that the host to device
+    transfer overlaps with the computation on the current batch.
+    """
+
+    def __init__(self, loader: DataLoader, device: torch.device, n_buffers: int = 2) -> None:
+        """
+        Initialize the prefetcher.
+
+        Args:
+            loader (DataLoader): The data loader to wrap, should not pin memory since batches are staged in the
+                prefetcher's own pinned buffers.
+            device (torch.device): The CUDA device to copy the batches to.
+            n_buffers (int, optional): The number of pinned buffer sets used in turn. Defaults to 2.
+        """
+        if torch.device(device).type != "cuda":
+            raise ValueError(f"❌ Prefetching requires a CUDA device, but got {device}.")
+        if n_buffers < 1:
+            raise ValueError(f"❌ Number of buffers must be at least 1, but got {n_buffers}.")
+
+        self.loader = loader
+        self.device = device
+        self.stream = torch.cuda.Stream(device=device)
+
+        # Pinned buffers are allocated once and reused, rather than pinning new memory for every batch
+        self.pinned_buffers = [{} for _ in range(n_buffers)]
+        self.copy_events = [None] * n_buffers
+        self.buffer_idx = 0
+
+        # Expose the sampler so that the trainer can set its epoch
+        self.sampler = loader.sampler
+        self.batch_sampler = loader.batch_sampler
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    def _to_pinned(self, batch: Any, buffers: dict, key: tuple = ()) -> Any:
+        """
+        Copy the tensors of the batch to reused pinned buffers.
+
+        Args:
+            batch (Any): The batch from the data loader.
+            buffers (dict): The pinned buffers, indexed by the position of the tensors in the batch.
+            key (tuple, optional): The position of the current element in the batch. Defaults to ().
+
+        Returns:
+            Any: The batch with its tensors in pinned memory.
+        """
+        if isinstance(batch, torch.Tensor):
+            buffer = buffers.get(key)
+            if buffer is None or buffer.shape != batch.shape or buffer.dtype != batch.dtype:
+                buffer = torch.empty(batch.shape, dtype=batch.dtype, pin_memory=True)
+                buffers[key] = buffer
+            return buffer.copy_(batch)
+        if isinstance(batch, (list, tuple)):
+            return type(batch)(
+                self._to_pinned(element, buffers, key + (i,)) for i, element in enumerate(batch)
+            )
+
+        return batch
+
+    def _preload(self, iterator: Iterator) -> Optional[Any]:
+        """
+        Get the next batch and start copying it to the device on the side stream.
+
+        Args:
+            iterator (Iterator): The data loader iterator.
+
+        Returns:
+            Optional[Any]: The batch on the device, or None if the iterator is exhausted.
+        """
+        try:
+            batch = next(iterator)
+        except StopIteration:
+            return None
+
+        # Wait for the previous copy from these buffers before overwriting them
+        copy_event = self.copy_events[self.buffer_idx]
+        if copy_event is not None:
+            copy_event.synchronize()
+        batch = self._to_pinned(batch, self.pinned_buffers[self.buffer_idx])
+
+        with torch.cuda.stream(self.stream):
+            batch = move_data_to_device(batch, self.device)
+            copy_event = torch.cuda.Event()
+            copy_event.record(self.stream)
+        self.copy_events[self.buffer_idx] = copy_event
+        self.buffer_idx = (self.buffer_idx + 1) % len(self.pinned_buffers)
+
+        return batch
+
+    def _record_stream(self, batch: Any) -> None:
+        """
+        Mark the tensors of the batch as used by the current stream, so that their memory is not reused by the
+        side stream before the computation on them is done.
+
+        Args:
+            batch (Any): The batch on the device.
+        """
+        if isinstance(batch, torch.Tensor):
+            batch.record_stream(torch.cuda.current_stream(self.device))
+        elif isinstance(batch, (list, tuple)):
+            for element in batch:
+                self._record_stream(element)
+        elif isinstance(batch, dict):
+            for element in batch.values():
+                self._record_stream(element)
+
+    def __iter__(self) -> Iterator[Any]:
+        iterator = iter(self.loader)
+        next_batch = self._preload(iterator)
+        while next_batch is not None:
+            # Wait for the copy of the batch before using it
+            torch.cuda.current_stream(self.device).wait_stream(self.stream)
+            batch = next_batch
+            self._record_stream(batch)
+
+            # Start copying the next batch while the current one is processed
+            next_batch = self._preload(iterator)
+
+            yield batch
+
+
+def get_prefetched_dataloader(
+    dataset: Dataset, trainer: Optional[pl.Trainer], with_prefetcher: bool, **kwargs
+) -> DataLoader | CUDAPrefetcher:
+    """
+    Get a data loader for the dataset, wrapped in a prefetcher if requested and the trainer runs on a CUDA device.
+
+    Args:
+        dataset (Dataset): The dataset to load.
+        trainer (Optional[pl.Trainer]): The trainer the data module is attached to, if any.
+        with_prefetcher (bool): Whether to prefetch the batches to the device.
+        **kwargs: The arguments of the data loader.
+
+    Returns:
+        DataLoader | CUDAPrefetcher: The data loader, or the prefetcher wrapping it.
+    """
+    if not with_prefetcher or trainer is None or trainer.strategy.root_device.type != "cuda":
+        return DataLoader(dataset, **kwargs)
+
+    # Batches are pinned in the reused buffers of the prefetcher
+    kwargs["pin_memory"] = False
+
+    # The trainer only adds distributed samplers to plain data loaders
+    if trainer.world_size > 1:
+        kwargs["sampler"] = DistributedSampler(
+            dataset,
+            num_replicas=trainer.world_size,
+            rank=trainer.global_rank,
+            shuffle=False,
+        )
+    loader = DataLoader(dataset, **kwargs)
+
+    return CUDAPrefetcher(loader, trainer.strategy.root_device)
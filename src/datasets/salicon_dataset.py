@@ -8,15 +8,16 @@ import os
 import torch
 import random
 import numpy as np
-from PIL import Image
 from natsort import natsorted
 import lightning.pytorch as pl
 from torchvision import transforms
 from typing import List, Tuple, Optional
 from torch.utils.data import Dataset, DataLoader
 from torchvision.transforms import functional as TF
+from torchvision.io import read_image, ImageReadMode
 
 from src.utils.random import set_seed
+from src.datasets.prefetcher import get_prefetched_dataloader
 from src.utils.file import get_paths_recursive
 from src.config import (
     IMAGE_SIZE,
@@ -30,21 +31,35 @@ class SaliconDataset(Dataset):
         self,
         sample_folder_paths: List[str],
         with_transforms: bool,
+        eps: float = 1e-7,
     ) -> None:
         super(SaliconDataset, self).__init__()
 
         self.sample_folder_paths = sample_folder_paths
         self.with_transforms = with_transforms
+        self.eps = eps
+        self.ground_truth_file_paths_list = self._get_ground_truth_file_paths_list()
+
+    def _get_ground_truth_file_paths_list(self) -> List[Tuple[str, ...]]:
+        # Sort ground truth paths once per sample rather than on every access
+        ground_truth_file_paths_list = []
+        for sample_folder_path in self.sample_folder_paths:
+            ground_truth_file_paths = get_paths_recursive(
+                sample_folder_path, match_pattern="ground_truth_*.jpg", path_type="f"
+            )
+            ground_truth_file_paths_list.append(tuple(natsorted(ground_truth_file_paths)))
+
+        return ground_truth_file_paths_list
 
     def __len__(self) -> int:
         return len(self.sample_folder_paths)
     
     def _apply_transforms(
         self,
-        frame: np.ndarray,
-        ground_truths: List[np.ndarray],
-        global_ground_truth: np.ndarray,
-    ) -> Tuple[np.ndarray, np.ndarray]:
+        frame: torch.Tensor,
+        ground_truths: List[torch.Tensor],
+        global_ground_truth: torch.Tensor,
+    ) -> Tuple[torch.Tensor, List[torch.Tensor], torch.Tensor]:
         if self.with_transforms:
             do_hflip = random.random() > 0.5
             do_vflip = random.random() > 1.0
@@ -89,7 +104,7 @@ class SaliconDataset(Dataset):
 
             # Apply zoom
             if do_zoom:
-                w, h = frame.size
+                h, w = frame.shape[-2:]
                 crop_w = int(w / zoom_factor)
                 crop_h = int(h / zoom_factor)
                 left = (w - crop_w) // 2
@@ -114,55 +129,43 @@ class SaliconDataset(Dataset):
 
         return frame, ground_truths, global_ground_truth
 
-    def __getitem__(self, index: int) -> Tuple[torch.Tensor, np.ndarray, np.ndarray]:
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, int]:
         sample_folder_path = self.sample_folder_paths[index]
         sample_id = int(Path(sample_folder_path).name)
 
         # Get frame
         frame_file_path = f"{sample_folder_path}/frame.jpg"
-        frame = Image.open(frame_file_path).convert("RGB")
-        frame = TF.resize(frame, (IMAGE_SIZE, IMAGE_SIZE))
+        frame = read_image(frame_file_path, mode=ImageReadMode.RGB)
+        frame = TF.resize(frame, (IMAGE_SIZE, IMAGE_SIZE), antialias=True)
 
         # Get ground truths if available...
-        ground_truth_file_paths = get_paths_recursive(
-            sample_folder_path, match_pattern="ground_truth_*.jpg", path_type="f"
-        )
-        ground_truth_file_paths = natsorted(ground_truth_file_paths)
+        ground_truth_file_paths = self.ground_truth_file_paths_list[index]
         global_ground_truth_file_path = f"{sample_folder_path}/global_ground_truth.png"
 
         # ...otherwise return the frame only, typically for the challenge test set
         if len(ground_truth_file_paths) == 0 or not os.path.exists(
             global_ground_truth_file_path
         ):
-            frame = TF.to_tensor(frame).float()
-            return frame, torch.zeros(1), torch.zeros(1), sample_id
+            return frame, torch.zeros(1, dtype=torch.uint8), torch.zeros(1, dtype=torch.uint8), sample_id
 
         ground_truths = [
-            Image.open(output_file_path).convert("L")
+            read_image(output_file_path, mode=ImageReadMode.GRAY)
             for output_file_path in ground_truth_file_paths
         ]
         ground_truths = [
-            TF.resize(gt, (IMAGE_SIZE, IMAGE_SIZE)) for gt in ground_truths
+            TF.resize(gt, (IMAGE_SIZE, IMAGE_SIZE), antialias=True) for gt in ground_truths
         ]
-        global_ground_truth = Image.open(global_ground_truth_file_path).convert("L")
+        global_ground_truth = read_image(global_ground_truth_file_path, mode=ImageReadMode.GRAY)
         global_ground_truth = TF.resize(
-            global_ground_truth, (IMAGE_SIZE, IMAGE_SIZE)
+            global_ground_truth, (IMAGE_SIZE, IMAGE_SIZE), antialias=True
         )
         frame, ground_truths, global_ground_truth = self._apply_transforms(
             frame, ground_truths, global_ground_truth
         )
 
-        # Convert to torch tensors and normalize ground truths
-        frame = TF.to_tensor(frame).float()
-        ground_truths = [
-            TF.to_tensor(ground_truth).float() for ground_truth in ground_truths
-        ]
-        ground_truths = [
-            ground_truth / ground_truth.max() for ground_truth in ground_truths
-        ]
-        ground_truths = torch.stack(ground_truths, axis=0).squeeze(1)
-        global_ground_truth = TF.to_tensor(global_ground_truth).float().squeeze(0)
-        global_ground_truth = global_ground_truth / global_ground_truth.max()
+        # Samples are returned as uint8, they are converted to float and normalized on the device
+        ground_truths = torch.cat(ground_truths, axis=0)
+        global_ground_truth = global_ground_truth[0]
 
         return frame, ground_truths, global_ground_truth, sample_id
 
@@ -178,6 +181,8 @@ class SaliconDataModule(pl.LightningDataModule):
         with_transforms: bool,
         n_workers: int,
         seed: Optional[int] = None,
+        with_prefetcher: bool = False,
+        eps: float = 1e-7,
     ):
         super().__init__()
         self.batch_size = batch_size
@@ -188,6 +193,8 @@ class SaliconDataModule(pl.LightningDataModule):
         self.with_transforms = with_transforms
         self.n_workers = n_workers
         self.seed = seed
+        self.with_prefetcher = with_prefetcher
+        self.eps = eps
 
         self.train_dataset: Optional[Dataset] = None
         self.val_dataset: Optional[Dataset] = None
@@ -296,32 +303,62 @@ class SaliconDataModule(pl.LightningDataModule):
             print(f"  - Test: {len(self.test_dataset)} samples")
 
     def train_dataloader(self):
-        return DataLoader(
+        return get_prefetched_dataloader(
             self.train_dataset,
+            trainer=self.trainer,
+            with_prefetcher=self.with_prefetcher,
             batch_size=self.batch_size,
             num_workers=self.n_workers,
             pin_memory=True,
             persistent_workers=True,
+            prefetch_factor=4,
             drop_last=True,
         )
 
     def val_dataloader(self):
-        return DataLoader(
+        return get_prefetched_dataloader(
             self.val_dataset,
+            trainer=self.trainer,
+            with_prefetcher=self.with_prefetcher,
             batch_size=self.batch_size,
             num_workers=self.n_workers,
             pin_memory=True,
             persistent_workers=True,
+            prefetch_factor=4,
         )
 
     def test_dataloader(self):
-        return DataLoader(
+        return get_prefetched_dataloader(
             self.test_dataset,
+            trainer=self.trainer,
+            with_prefetcher=self.with_prefetcher,
             batch_size=self.batch_size,
             num_workers=self.n_workers,
             pin_memory=True,
             persistent_workers=True,
+            prefetch_factor=4,
         )
 
     def predict_dataloader(self):
         return self.test_dataset
+
+    def on_after_batch_transfer(self, batch, dataloader_idx: int):
+        # Batches are transferred as uint8 and only converted to float on the device
+        frames, ground_truths, global_ground_truths, sample_ids = batch
+        frames = frames.float().div_(255.0)
+
+        # Challenge test samples only have placeholder ground truths, without spatial dimensions
+        ground_truths = ground_truths.float()
+        global_ground_truths = global_ground_truths.float()
+        if ground_truths.dim() < 3:
+            return frames, ground_truths, global_ground_truths, sample_ids
+
+        # Normalize ground truths
+        ground_truths = ground_truths / (
+            ground_truths.amax(dim=(-2, -1), keepdim=True) + self.eps
+        )
+        global_ground_truths = global_ground_truths / (
+            global_ground_truths.amax(dim=(-2, -1), keepdim=True) + self.eps
+        )
+
+        return frames, ground_truths, global_ground_truths, sample_ids
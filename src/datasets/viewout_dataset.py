@@ -7,12 +7,12 @@ sys.path.append(str(GLOBAL_DIR))
 import torch
 import random
 import numpy as np
-from PIL import Image
 from natsort import natsorted
 import lightning.pytorch as pl
 from typing import List, Tuple, Optional
 from torch.utils.data import Dataset, DataLoader
 from torchvision.transforms import functional as TF
+from torchvision.io import read_image, ImageReadMode
 
 from src.utils.random import set_seed
 from src.utils.file import get_paths_recursive
@@ -24,15 +24,18 @@ class ViewOutDataset(Dataset):
         self,
         sample_folder_paths: List[List[str]],
         with_transforms: bool,
+        eps: float = 1e-7,
     ) -> None:
         super(ViewOutDataset, self).__init__()
 
         self.sample_folder_paths = sample_folder_paths
         self.with_transforms = with_transforms
-        self.samples = self._get_samples()
+        self.eps = eps
+        self.videos, self.sample_offsets = self._get_samples()
+        self.preloaded_videos = None
 
-    def _get_samples(self) -> List[Tuple[List[str], List[str]]]:
-        samples = []
+    def _get_samples(self) -> Tuple[List[Tuple[Tuple[str, ...], Tuple[str, ...]]], np.ndarray]:
+        videos = []
         for sample_folder_path in self.sample_folder_paths:
             # Get frames and ground_truth paths
             frames_folder_path = f"{sample_folder_path}/frames"
@@ -64,25 +67,64 @@ class ViewOutDataset(Dataset):
                 )
             frames = frames[: len(ground_truths)]
 
-            n_samples = len(frames) - SEQUENCE_LENGTH + 1
-            if n_samples <= 0:
+            if len(frames) < SEQUENCE_LENGTH:
                 continue
 
-            for start_idx in range(n_samples):
-                end_idx = start_idx + SEQUENCE_LENGTH
-                sample = (frames[start_idx:end_idx], ground_truths[start_idx:end_idx])
-                samples.append(sample)
+            # Store the paths once per video, samples are sliced from them
+            videos.append((tuple(frames), tuple(ground_truths)))
 
-        return samples
+        # Get the index of the first sample of each following video
+        sample_offsets = np.cumsum(
+            [len(frames) - SEQUENCE_LENGTH + 1 for frames, _ in videos], dtype=np.int64
+        )
+
+        return videos, sample_offsets
 
     def __len__(self) -> int:
-        return len(self.samples)
+        return int(self.sample_offsets[-1]) if len(self.sample_offsets) > 0 else 0
+
+    def get_n_bytes(self) -> int:
+        # Size of the decoded uint8 frames and ground truths of all videos
+        n_frames = sum(len(frames) for frames, _ in self.videos)
+
+        return n_frames * 4 * IMAGE_SIZE * IMAGE_SIZE
+
+    @staticmethod
+    def _read_frames(
+        frame_file_paths: Tuple[str, ...],
+        ground_truth_file_paths: Tuple[str, ...],
+    ) -> Tuple[List[torch.Tensor], List[torch.Tensor]]:
+        frames = [
+            read_image(frame_file_path, mode=ImageReadMode.RGB)
+            for frame_file_path in frame_file_paths
+        ]
+        frames = [TF.resize(frame, (IMAGE_SIZE, IMAGE_SIZE), antialias=True) for frame in frames]
+        ground_truths = [
+            read_image(ground_truth_file_path, mode=ImageReadMode.GRAY)
+            for ground_truth_file_path in ground_truth_file_paths
+        ]
+        ground_truths = [
+            TF.resize(ground_truth, (IMAGE_SIZE, IMAGE_SIZE), antialias=True)
+            for ground_truth in ground_truths
+        ]
+
+        return frames, ground_truths
+
+    def preload(self, device: torch.device) -> None:
+        # Decode every frame once and keep the whole dataset on the device, samples are then sliced from it
+        preloaded_videos = []
+        for frame_file_paths, ground_truth_file_paths in self.videos:
+            frames, ground_truths = self._read_frames(frame_file_paths, ground_truth_file_paths)
+            frames = torch.stack(frames, axis=0).to(device)
+            ground_truths = torch.stack(ground_truths, axis=0).to(device)
+            preloaded_videos.append((frames, ground_truths))
+        self.preloaded_videos = preloaded_videos
 
     def _apply_transforms(
         self,
-        frames: List[np.ndarray],
-        ground_truths: List[np.ndarray],
-    ) -> Tuple[np.ndarray, np.ndarray]:
+        frames: List[torch.Tensor],
+        ground_truths: List[torch.Tensor],
+    ) -> Tuple[List[torch.Tensor], List[torch.Tensor]]:
         if self.with_transforms:
             do_hflip = random.random() > 0.5
             do_vflip = random.random() > 1.0
@@ -136,7 +178,7 @@ class ViewOutDataset(Dataset):
 
             # Apply zoom
             if do_zoom:
-                w, h = frame.size
+                h, w = frames[0].shape[-2:]
                 crop_w = int(w / zoom_factor)
                 crop_h = int(h / zoom_factor)
                 left = (w - crop_w) // 2
@@ -167,46 +209,38 @@ class ViewOutDataset(Dataset):
     def __getitem__(
         self, index: int
     ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-        sample = self.samples[index]
-        frame_file_paths, ground_truth_file_paths = sample
+        if index < 0 or index >= len(self):
+            raise IndexError(f"❌ Index {index} out of range for {len(self)} samples.")
+        video_idx = int(np.searchsorted(self.sample_offsets, index, side="right"))
+        start_idx = index - (int(self.sample_offsets[video_idx - 1]) if video_idx > 0 else 0)
+        end_idx = start_idx + SEQUENCE_LENGTH
         sample_id = index
 
-        # Get frames
-        frame_file_paths = natsorted(frame_file_paths)
-        frames = [
-            Image.open(frame_file_path).convert("RGB")
-            for frame_file_path in frame_file_paths
-        ]
-        frames = [TF.resize(frame, (IMAGE_SIZE, IMAGE_SIZE)) for frame in frames]
-
-        # Get ground truths
-        ground_truth_file_paths = natsorted(ground_truth_file_paths)
-        ground_truths = [
-            Image.open(ground_truth_file_path).convert("L")
-            for ground_truth_file_path in ground_truth_file_paths
-        ]
-        ground_truths = [
-            TF.resize(ground_truth, (IMAGE_SIZE, IMAGE_SIZE))
-            for ground_truth in ground_truths
-        ]
+        # Get frames and ground truths, either sliced from the preloaded videos or read from their paths, which are
+        # already sorted in _get_samples
+        if self.preloaded_videos is not None:
+            frames, ground_truths = self.preloaded_videos[video_idx]
+            frames = list(frames[start_idx:end_idx].unbind(0))
+            ground_truths = list(ground_truths[start_idx:end_idx].unbind(0))
+        else:
+            frames, ground_truths = self.videos[video_idx]
+            frames, ground_truths = self._read_frames(
+                frames[start_idx:end_idx], ground_truths[start_idx:end_idx]
+            )
 
         # Apply transforms
         frames, ground_truths = self._apply_transforms(frames, ground_truths)
 
         # Convert to torch tensors
-        frames = [TF.to_tensor(frame).float() for frame in frames]
-        frames = torch.stack(frames, axis=0)
-        ground_truths = [
-            TF.to_tensor(ground_truth).float() for ground_truth in ground_truths
-        ]
-        ground_truths = [
-            ground_truth / ground_truth.max() for ground_truth in ground_truths
-        ]
-        ground_truths = torch.stack(ground_truths, axis=0).squeeze(1)
+        frames = torch.stack(frames, axis=0).float() / 255.0
+        ground_truths = torch.cat(ground_truths, axis=0).float()
+        ground_truths = ground_truths / (
+            ground_truths.amax(dim=(-2, -1), keepdim=True) + self.eps
+        )
 
         # Get global ground truth
         global_ground_truth = torch.mean(ground_truths, axis=0)
-        global_ground_truth = global_ground_truth / global_ground_truth.max()
+        global_ground_truth = global_ground_truth / (global_ground_truth.max() + self.eps)
 
         return frames, ground_truths, global_ground_truth, sample_id
 
@@ -218,12 +252,15 @@ class ViewOutDataModule(pl.LightningDataModule):
         with_transforms: bool,
         n_workers: int,
         seed: Optional[int] = None,
+        preload_to_device: bool = False,
     ):
         super().__init__()
         self.batch_size = batch_size
         self.with_transforms = with_transforms
         self.n_workers = n_workers
         self.seed = seed
+        self.preload_to_device = preload_to_device
+        self.preload_device: Optional[torch.device] = None
 
         self.train_dataset: Optional[Dataset] = None
         self.val_dataset: Optional[Dataset] = None
@@ -290,37 +327,70 @@ class ViewOutDataModule(pl.LightningDataModule):
                 sample_folder_paths=self.val_sample_folder_paths,
                 with_transforms=False,
             )
+            self.preload_device = self._get_preload_device(self.train_dataset, self.val_dataset)
+            if self.preload_device is not None:
+                self.train_dataset.preload(self.preload_device)
+                self.val_dataset.preload(self.preload_device)
 
         if stage == "test" or stage is None:
             self.test_dataset = ViewOutDataset(
                 sample_folder_paths=self.val_sample_folder_paths,
                 with_transforms=False,
             )
+            self.preload_device = self._get_preload_device(self.test_dataset)
+            if self.preload_device is not None:
+                self.test_dataset.preload(self.preload_device)
+
+    def _get_preload_device(self, *datasets: ViewOutDataset) -> Optional[torch.device]:
+        if (
+            not self.preload_to_device
+            or self.trainer is None
+            or self.trainer.strategy.root_device.type != "cuda"
+        ):
+            return None
+
+        # Keep half of the free memory for training, fall back to loading from disk otherwise
+        device = self.trainer.strategy.root_device
+        n_bytes = sum(dataset.get_n_bytes() for dataset in datasets)
+        free_n_bytes, _ = torch.cuda.mem_get_info(device)
+        if n_bytes > free_n_bytes // 2:
+            print(
+                f"⚠️ Dataset of {n_bytes / 1e9:.2f} GB does not fit on the device, loading samples from disk instead."
+            )
+            return None
+
+        print(f"🚀 Preloading dataset of {n_bytes / 1e9:.2f} GB on {device}.")
+        return device
+
+    def _get_dataloader(self, dataset: ViewOutDataset, **kwargs) -> DataLoader:
+        if self.preload_device is None:
+            return DataLoader(
+                dataset,
+                num_workers=self.n_workers,
+                pin_memory=True,
+                persistent_workers=True,
+                prefetch_factor=4,
+                **kwargs,
+            )
+
+        # Samples are already on the device, they are indexed in the main process since workers cannot share them
+        return DataLoader(dataset, num_workers=0, pin_memory=False, **kwargs)
 
     def train_dataloader(self):
-        return DataLoader(
+        return self._get_dataloader(
             self.train_dataset,
             batch_size=self.batch_size,
-            num_workers=self.n_workers,
-            pin_memory=True,
-            persistent_workers=True,
             drop_last=True,
         )
 
     def val_dataloader(self):
-        return DataLoader(
+        return self._get_dataloader(
             self.val_dataset,
             batch_size=self.batch_size,
-            num_workers=self.n_workers,
-            pin_memory=True,
-            persistent_workers=True,
         )
 
     def test_dataloader(self):
-        return DataLoader(
+        return self._get_dataloader(
             self.test_dataset,
             batch_size=self.batch_size,
-            num_workers=self.n_workers,
-            pin_memory=True,
-            persistent_workers=True,
         )
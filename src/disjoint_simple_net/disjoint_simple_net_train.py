@@ -12,9 +12,11 @@ import platform
 import multiprocessing
 import lightning.pytorch as pl
 from lightning.pytorch.loggers import WandbLogger
-from lightning.pytorch.callbacks import ModelCheckpoint
+from lightning.pytorch.plugins.io import AsyncCheckpointIO
+from lightning.pytorch.callbacks import ModelCheckpoint, TQDMProgressBar
 
 from src.utils.random import set_seed
+from src.utils.backend import set_backends
 from src.utils.parser import get_config
 from src.utils.file import get_paths_recursive
 from src.datasets.dhf1k_dataset import DHF1KDataModule
@@ -25,6 +27,7 @@ from src.lightning_models.lightning_model import LightningModel
 from src.config import (
     SEED,
     N_WORKERS,
+    PROGRESS_BAR_REFRESH_RATE,
     MODELS_PATH,
     CONFIG_PATH,
     CHECKPOINTS_PATH,
@@ -66,6 +69,7 @@ def _get_data_module(
             with_transforms=with_transforms,
             n_workers=N_WORKERS,
             seed=SEED,
+            with_prefetcher=True,
         )
     elif dataset == "dhf1k":
         sample_folder_paths = get_paths_recursive(
@@ -80,6 +84,7 @@ def _get_data_module(
             with_transforms=with_transforms,
             n_workers=N_WORKERS,
             seed=SEED,
+            with_prefetcher=True,
         )
     elif dataset == "viewout":
         data_module = ViewOutDataModule(
@@ -87,6 +92,7 @@ def _get_data_module(
             with_transforms=with_transforms,
             n_workers=N_WORKERS,
             seed=SEED,
+            preload_to_device=True,
         )
     else:
         raise ValueError(f"❌ Unknown dataset {dataset}.")
@@ -131,6 +137,7 @@ def main() -> None:
     if platform.system() != "Windows":
         multiprocessing.set_start_method("forkserver", force=True)
     set_seed(SEED)
+    set_backends()
 
     # Parse arguments
     args = parse_arguments()
@@ -152,6 +159,7 @@ def main() -> None:
     hidden_channels_list = list(map(int, config["hidden_channels_list"]))
     dropout_rate = float(config["dropout_rate"])
     with_checkpoint = bool(config["with_checkpoint"])
+    with_compile = bool(config["with_compile"])
     print(f"✅ Using config file at {Path(config_file_path).resolve()}")
 
     # Get dataset
@@ -171,6 +179,12 @@ def main() -> None:
         hidden_channels_list=hidden_channels_list,
         dropout_rate=dropout_rate,
     )
+
+    # Optionally compile the model in place, fusing its pointwise operations while keeping the parameter names of
+    # the checkpoints unchanged
+    if with_compile:
+        model.compile(dynamic=False)
+
     if with_checkpoint:
         checkpoint_file_path = f"{CHECKPOINTS_PATH}/disjoint_simple_net_temporal.ckpt"
         if not os.path.exists(checkpoint_file_path):
@@ -182,6 +196,7 @@ def main() -> None:
             weight_decay=weight_decay,
             name="disjoint_simple_net",
             dataset=dataset,
+            with_compile=with_compile,
         )
     else:
         lightning_model = LightningModel(
@@ -189,7 +204,8 @@ def main() -> None:
             learning_rate=learning_rate,
             weight_decay=weight_decay,
             name="disjoint_simple_net",
-            dataset=dataset
+            dataset=dataset,
+            with_compile=with_compile,
         )
 
     # Get trainer and train
@@ -200,6 +216,7 @@ def main() -> None:
         config=config,
     )
 
+    callbacks = [TQDMProgressBar(refresh_rate=PROGRESS_BAR_REFRESH_RATE)]
     if save_model:
         checkpoint_callback = ModelCheckpoint(
             dirpath=f"{MODELS_PATH}/disjoint_simple_net/{wandb_name}",
@@ -208,20 +225,19 @@ def main() -> None:
             monitor="val_loss",
             mode="min",
         )
-        callbacks = [checkpoint_callback]
-    else:
-        callbacks = []
+        callbacks.append(checkpoint_callback)
 
     trainer = pl.Trainer(
         max_epochs=n_epochs,
         accelerator="gpu",
         devices=-1,
         num_nodes=n_nodes,
-        precision=16,
+        precision="bf16-mixed",
         strategy="ddp" if torch.cuda.device_count() > 1 else "auto",
         val_check_interval=evaluation_steps,
         logger=wandb_logger,
         callbacks=callbacks,
+        plugins=[AsyncCheckpointIO()],
     )
 
     trainer.fit(
@@ -9,7 +9,7 @@ import torch
 import numpy as np
 from torch import nn
 from PIL import Image
-from typing import Tuple
+from typing import Optional, Tuple
 import lightning.pytorch as pl
 
 from src.losses.kl_div import KLDivLoss
@@ -32,6 +32,8 @@ class LightningModel(pl.LightningModule):
         weight_decay: float,
         name: str,
         dataset: str,
+        cuda_graph_batch_size: Optional[int] = None,
+        with_compile: bool = False,
     ) -> None:
         super(LightningModel, self).__init__()
 
@@ -40,8 +42,11 @@ class LightningModel(pl.LightningModule):
         self.weight_decay = weight_decay
         self.name = name
         self.dataset = dataset
+        self.cuda_graph_batch_size = cuda_graph_batch_size
+        self.with_compile = with_compile
 
-        # Get criterion
+        # Get criterion, optionally compiled so that the normalizations and reductions of both losses are fused into
+        # a few kernels reading the maps once, with one graph for each of the temporal and global output shapes
         kl_loss = KLDivLoss()
         corr_loss = CorrelationCoefficientLoss()
         self.criterion = CombinedLoss(
@@ -50,9 +55,17 @@ class LightningModel(pl.LightningModule):
                 "cc": (corr_loss, LOSS_WEIGHTS["cc"]),
             }
         )
+        if with_compile:
+            self.criterion = torch.compile(self.criterion, dynamic=False)
 
         self.save_hyperparameters(ignore=['model', 'criterion'])
 
+        # Metrics are stateless, a single instance is shared by all evaluation steps
+        self.metrics = Metrics()
+
+        # Center bias prior of the dataset, only loaded on the first evaluation step
+        self.center_bias = None
+
         self.best_eval_val_loss = float('inf')
         self.eval_train_loss = 0
         self.eval_val_loss = 0
@@ -60,6 +73,26 @@ class LightningModel(pl.LightningModule):
     def forward(self, batch):
         pass
 
+    def on_fit_start(self) -> None:
+        # Capture the CUDA graphs of the model once it is on its device, if requested
+        if self.cuda_graph_batch_size is not None:
+            self.model.capture_graph_processors(self.cuda_graph_batch_size)
+
+    def _get_center_bias(self) -> torch.Tensor:
+        # Load the center bias prior once and keep it on the device, rather than reading it at every step
+        if self.center_bias is None or self.center_bias.device != self.device:
+            if self.dataset == "salicon":
+                center_bias_path = f"{SALICON_PATH}/center_bias.jpg"
+            elif self.dataset == "dhf1k":
+                center_bias_path = f"{DHF1K_PATH}/center_bias.jpg"
+            elif self.dataset == "viewout":
+                center_bias_path = f"{VIEWOUT_PATH}/center_bias.jpg"
+            else:
+                raise ValueError(f"❌ Unknown dataset {self.dataset}.")
+            self.center_bias = torch.tensor(np.array(Image.open(center_bias_path).convert("L"))).float().to(self.device)
+
+        return self.center_bias
+
     def _process_batch(self, batch) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
         inputs, temporal_targets, global_targets, _ = batch
         
@@ -83,6 +116,12 @@ class LightningModel(pl.LightningModule):
             global_targets,
         )
     
+    def _log_train_loss(self, name: str, value: torch.Tensor) -> None:
+        # Step values are logged as is from each device and only the epoch averages are reduced across devices, so
+        # that no collective communication runs at every step, with the same names as when logging both at once
+        self.log(f'{name}_step', value, on_step=True, on_epoch=False)
+        self.log(f'{name}_epoch', value, on_step=False, on_epoch=True, sync_dist=True)
+
     def training_step(self, batch, batch_idx):
         temporal_train_loss, global_train_loss, _, _, _, _ = self._process_batch(batch)
         
@@ -94,11 +133,11 @@ class LightningModel(pl.LightningModule):
             train_loss = train_loss + global_train_loss
             
         # Log metrics
-        self.log('train_loss', train_loss, on_step=True, on_epoch=True, sync_dist=True)
+        self._log_train_loss('train_loss', train_loss)
         if temporal_train_loss is not None:
-            self.log('temporal_train_loss', temporal_train_loss, on_step=True, on_epoch=True, sync_dist=True)
+            self._log_train_loss('temporal_train_loss', temporal_train_loss)
         if global_train_loss is not None:
-            self.log('global_train_loss', global_train_loss, on_step=True, on_epoch=True, sync_dist=True)
+            self._log_train_loss('global_train_loss', global_train_loss)
 
         return train_loss
     
@@ -115,26 +154,18 @@ class LightningModel(pl.LightningModule):
             self.log('val_global_loss', global_val_loss, on_epoch=True, sync_dist=True)
             
         # Get center bias dataset for metrics
-        if self.dataset == "salicon":
-            center_bias_path = f"{SALICON_PATH}/center_bias.jpg"
-            center_bias = torch.tensor(np.array(Image.open(center_bias_path).convert("L"))).float().to(self.device)
-        elif self.dataset == "dhf1k":
-            center_bias_path = f"{DHF1K_PATH}/center_bias.jpg"
-            center_bias = torch.tensor(np.array(Image.open(center_bias_path).convert("L"))).float().to(self.device)
-        elif self.dataset == "viewout":
-            center_bias_path = f"{VIEWOUT_PATH}/center_bias.jpg"
-            center_bias = torch.tensor(np.array(Image.open(center_bias_path).convert("L"))).float().to(self.device)
+        center_bias = self._get_center_bias()
         
         # Calculate metrics
         metrics = {}
         if temporal_output is not None and temporal_ground_truth is not None:
-            temporal_metrics = Metrics().get_metrics(temporal_output, temporal_ground_truth, center_bias_prior=center_bias)
+            temporal_metrics = self.metrics.get_metrics(temporal_output, temporal_ground_truth, center_bias_prior=center_bias)
             for key, value in temporal_metrics.items():
                 self.log(f'val_temporal_{key}', value, on_epoch=True, sync_dist=True)
                 metrics[f'temporal_{key}'] = value
                 
         if global_output is not None and global_ground_truth is not None:
-            global_metrics = Metrics().get_metrics(global_output, global_ground_truth, center_bias_prior=center_bias)
+            global_metrics = self.metrics.get_metrics(global_output, global_ground_truth, center_bias_prior=center_bias)
             for key, value in global_metrics.items():
                 self.log(f'val_global_{key}', value, on_epoch=True, sync_dist=True)
                 metrics[f'global_{key}'] = value
@@ -199,31 +230,24 @@ class LightningModel(pl.LightningModule):
             self.log('test_global_loss', global_test_loss, on_epoch=True, sync_dist=True)
 
         # Get center bias dataset for metrics
-        if self.dataset == "salicon":
-            center_bias_path = f"{SALICON_PATH}/center_bias.jpg"
-            center_bias = torch.tensor(np.array(Image.open(center_bias_path).convert("L"))).float().to(self.device)
-        elif self.dataset == "dhf1k":
-            center_bias_path = f"{DHF1K_PATH}/center_bias.jpg"
-            center_bias = torch.tensor(np.array(Image.open(center_bias_path).convert("L"))).float().to(self.device)
+        center_bias = self._get_center_bias()
 
         # Calculate metrics
         if temporal_output is not None and temporal_ground_truth is not None:
             # Get global metrics for every temporal estimation
-            temporal_metrics = Metrics().get_metrics(temporal_output, temporal_ground_truth, center_bias_prior=center_bias)
+            temporal_metrics = self.metrics.get_metrics(temporal_output, temporal_ground_truth, center_bias_prior=center_bias)
             for key, value in temporal_metrics.items():
                 self.log(f'test_temporal_{key}', value, on_epoch=True, sync_dist=True)
                 metrics[f'temporal_{key}'] = value
-            # Get separate metrics for each temporal 
+            # Get separate metrics for each temporal estimation at once, averaged over the batch only
+            temporal_frame_metrics = self.metrics.get_metrics(temporal_output, temporal_ground_truth, center_bias_prior=center_bias, dim=(0,))
             for i in range(temporal_output.shape[1]):
-                temporal_output_i = temporal_output[:, i, :, :]
-                temporal_ground_truth_i = temporal_ground_truth[:, i, :, :]
-                temporal_metrics_i = Metrics().get_metrics(temporal_output_i, temporal_ground_truth_i, center_bias_prior=center_bias)
-                for key, value in temporal_metrics_i.items():
-                    self.log(f'test_temporal_{i}_{key}', value, on_epoch=True, sync_dist=True)
-                    metrics[f'temporal_{i}_{key}'] = value
+                for key, values in temporal_frame_metrics.items():
+                    self.log(f'test_temporal_{i}_{key}', values[i], on_epoch=True, sync_dist=True)
+                    metrics[f'temporal_{i}_{key}'] = values[i]
 
         if global_output is not None and global_ground_truth is not None:
-            global_metrics = Metrics().get_metrics(global_output, global_ground_truth, center_bias_prior=center_bias)
+            global_metrics = self.metrics.get_metrics(global_output, global_ground_truth, center_bias_prior=center_bias)
             for key, value in global_metrics.items():
                 self.log(f'test_global_{key}', value, on_epoch=True, sync_dist=True)
                 metrics[f'global_{key}'] = value
@@ -236,13 +260,45 @@ class LightningModel(pl.LightningModule):
         temporal_output, global_output = self.model(input)
         return temporal_output, global_output, sample_ids
 
+    def optimizer_zero_grad(self, epoch, batch_idx, optimizer):
+        # Release the gradients instead of filling them with zeros, the next backward pass allocates them again
+        optimizer.zero_grad(set_to_none=True)
+
+    @staticmethod
+    def _compile_optimizer_step(optimizer: torch.optim.Optimizer) -> None:
+        compiled_step = torch.compile(optimizer.step, fullgraph=False)
+
+        # The strategy and precision plugin still call the step with the closure running the forward and backward
+        # passes and the hooks before the update, only the parameter update itself is compiled
+        def step(closure=None):
+            loss = None
+            if closure is not None:
+                with torch.enable_grad():
+                    loss = closure()
+            compiled_step()
+
+            return loss
+
+        optimizer.step = step
+
     def configure_optimizers(self):
+        # Only pass the trainable parameters, frozen ones would only be iterated over at every step. When the parameter
+        # update is compiled, it uses the multi-tensor implementation, which the fused one cannot replace since it is
+        # not traced, and the learning rate is a tensor so that its updates by the scheduler do not trigger
+        # recompilations, which requires a capturable optimizer. Otherwise the fused implementation updates all
+        # parameters at once on CUDA
+        with_fused = not self.with_compile and self.device.type == "cuda"
         optimizer = torch.optim.AdamW(
-            self.parameters(),
-            lr=self.learning_rate,
+            [param for param in self.parameters() if param.requires_grad],
+            lr=torch.tensor(self.learning_rate) if self.with_compile else self.learning_rate,
             weight_decay=self.weight_decay,
             betas=(0.9, 0.95),
+            foreach=True if self.with_compile else None,
+            capturable=self.with_compile,
+            fused=True if with_fused else None,
         )
+        if self.with_compile:
+            self._compile_optimizer_step(optimizer)
         learning_rate_scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
             optimizer, mode='min', factor=0.5, patience=1
         )
@@ -12,11 +12,13 @@ import platform
 import multiprocessing
 import lightning.pytorch as pl
 from lightning.pytorch.loggers import WandbLogger
-from lightning.pytorch.callbacks import ModelCheckpoint
+from lightning.pytorch.plugins.io import AsyncCheckpointIO
+from lightning.pytorch.callbacks import ModelCheckpoint, TQDMProgressBar
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
 
 from src.utils.random import set_seed
+from src.utils.backend import set_backends
 from src.models.livesal import LiveSAL
 from src.utils.parser import get_config
 from src.utils.file import get_paths_recursive
@@ -27,6 +29,7 @@ from src.lightning_models.lightning_model import LightningModel
 from src.config import (
     SEED,
     N_WORKERS,
+    PROGRESS_BAR_REFRESH_RATE,
     MODELS_PATH,
     CONFIG_PATH,
     CHECKPOINTS_PATH,
@@ -68,6 +71,7 @@ def _get_data_module(
             with_transforms=with_transforms,
             n_workers=N_WORKERS,
             seed=SEED,
+            with_prefetcher=True,
         )
     elif dataset == "dhf1k":
         sample_folder_paths = get_paths_recursive(
@@ -82,6 +86,7 @@ def _get_data_module(
             with_transforms=with_transforms,
             n_workers=N_WORKERS,
             seed=SEED,
+            decode_on_device=True,
         )
     elif dataset == "viewout":
         data_module = ViewOutDataModule(
@@ -89,6 +94,7 @@ def _get_data_module(
             with_transforms=with_transforms,
             n_workers=N_WORKERS,
             seed=SEED,
+            preload_to_device=True,
         )
     else:
         raise ValueError(f"❌ Unknown dataset {dataset}.")
@@ -133,6 +139,7 @@ def main() -> None:
     if platform.system() != "Windows":
         multiprocessing.set_start_method("forkserver", force=True)
     set_seed(SEED)
+    set_backends()
 
     # Parse arguments
     args = parse_arguments()
@@ -166,8 +173,12 @@ def main() -> None:
     with_graph_positional_embeddings = bool(config["with_graph_positional_embeddings"])
     with_graph_directional_kernels = bool(config["with_graph_directional_kernels"])
     with_depth_information = bool(config["with_depth_information"])
+    amp_dtype = str(config["amp_dtype"])
     depth_integration_type = str(config["depth_integration_type"])
     with_checkpoint = bool(config["with_checkpoint"])
+    with_compile = bool(config["with_compile"])
+    with_autotune = bool(config["with_autotune"])
+    with_cuda_graphs = bool(config["with_cuda_graphs"])
     print(f"✅ Using config file at {Path(config_file_path).resolve()}")
 
     # Get dataset
@@ -199,7 +210,28 @@ def main() -> None:
         with_graph_directional_kernels=with_graph_directional_kernels,
         with_depth_information=with_depth_information,
         depth_integration_type=depth_integration_type,
+        amp_dtype=amp_dtype,
     )
+
+    # Optionally compile the decoders and the spatio-temporal mixing module in place, autotuning their channels last
+    # convolutions while keeping the parameter names of the checkpoints unchanged, unless the whole pipelines are
+    # compiled below. CUDA graphs are left out since the rest of the model is eager
+    if with_autotune and not with_compile:
+        if with_depth_information and depth_integration_type == "late":
+            model.depth_decoder.compile(dynamic=False, mode="max-autotune-no-cudagraphs")
+        model.temporal_decoder.compile(dynamic=False, mode="max-autotune-no-cudagraphs")
+        model.global_decoder.compile(dynamic=False, mode="max-autotune-no-cudagraphs")
+        model.spatio_temporal_mixing_module.compile(dynamic=False, mode="max-autotune-no-cudagraphs")
+
+    # Optionally compile the whole model, so that the small attention and pointwise operations of the graph
+    # processors and decoders, and the normalizations around them, are fused rather than bound by the dispatch
+    # overhead. Shapes are fixed, so image and video pipelines are compiled separately with static shapes. With
+    # CUDA graphs, the whole compiled forward and backward passes are captured and replayed, rather than only the
+    # graph processors of the eager model
+    if with_compile:
+        model.compile_pipelines(mode="reduce-overhead" if with_cuda_graphs else None)
+    cuda_graph_batch_size = batch_size if with_cuda_graphs and not with_compile else None
+
     if with_checkpoint:
         checkpoint_file_path = f"{CHECKPOINTS_PATH}/livesal_temporal.ckpt"
         if not os.path.exists(checkpoint_file_path):
@@ -213,6 +245,8 @@ def main() -> None:
             weight_decay=weight_decay,
             name="livesal",
             dataset=dataset,
+            cuda_graph_batch_size=cuda_graph_batch_size,
+            with_compile=with_compile,
         )
     else:
         lightning_model = LightningModel(
@@ -221,6 +255,8 @@ def main() -> None:
             weight_decay=weight_decay,
             name="livesal",
             dataset=dataset,
+            cuda_graph_batch_size=cuda_graph_batch_size,
+            with_compile=with_compile,
         )
 
     # Get trainer and train
@@ -231,6 +267,8 @@ def main() -> None:
         config=config,
     )
 
+    # Refresh the progress bar every few steps only, to keep terminal writes off the training loop
+    callbacks = [TQDMProgressBar(refresh_rate=PROGRESS_BAR_REFRESH_RATE)]
     if save_model:
         checkpoint_callback = ModelCheckpoint(
             dirpath=f"{MODELS_PATH}/livesal/{wandb_name}",
@@ -239,20 +277,21 @@ def main() -> None:
             monitor="val_loss",
             mode="min",
         )
-        callbacks = [checkpoint_callback]
-    else:
-        callbacks = []
+        callbacks.append(checkpoint_callback)
 
     trainer = pl.Trainer(
         max_epochs=n_epochs,
         accelerator="gpu",
         devices=-1,
         num_nodes=n_nodes,
-        precision=32,
+        # Half precision gradients underflow without loss scaling, which only the mixed precision plugin provides
+        precision="16-mixed" if amp_dtype == "float16" else 32,
         strategy="ddp" if torch.cuda.device_count() > 1 else "auto",
         val_check_interval=evaluation_steps,
         logger=wandb_logger,
         callbacks=callbacks,
+        # Write checkpoints from a background thread, training goes on with a copy of the weights on the device
+        plugins=[AsyncCheckpointIO()],
     )
 
     trainer.fit(
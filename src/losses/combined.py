@@ -24,11 +24,12 @@ class CombinedLoss(nn.Module):
             current_loss = loss_fn(pred, target)
             weighted_loss = current_loss * self.weights[name]
             total_loss += weighted_loss
-            losses_dict[name] = current_loss.item()
+            # Keep the losses on the device, they are only synchronized to the host when requested
+            losses_dict[name] = current_loss.detach()
 
         self.last_losses = losses_dict
 
         return total_loss
 
     def get_last_losses(self) -> Dict[str, float]:
-        return self.last_losses
+        return {name: loss.item() for name, loss in self.last_losses.items()}
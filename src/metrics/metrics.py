@@ -1,6 +1,98 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from typing import Optional, Tuple
+
+
+def _get_kldiv_cc_nss(
+    pred: torch.Tensor, target: torch.Tensor, eps: float
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Calculate the KL divergence, the correlation coefficient and the NSS score between saliency maps, from
+    statistics shared between them.
+
+    Args:
+        pred (torch.Tensor): The predicted saliency maps, of shape (..., H, W).
+        target (torch.Tensor): The target saliency maps, of shape (..., H, W).
+        eps (float): The epsilon value to avoid division by zero.
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor, torch.Tensor]: The KL divergence, the correlation coefficient and the
+            NSS score per map.
+    """
+    # Flatten spatial dimensions, keeping any leading batch and sequence dimensions so that all reductions are
+    # over the last dimension
+    pred = pred.flatten(-2)
+    target = target.flatten(-2)
+    n_pixels = pred.size(-1)
+
+    # Get statistics shared between metrics
+    pred_centered = pred - pred.mean(dim=-1, keepdim=True)
+    target_centered = target - target.mean(dim=-1, keepdim=True)
+    pred_squared_sum = (pred_centered**2).sum(dim=-1)
+    target_squared_sum = (target_centered**2).sum(dim=-1)
+    target_sum = target.sum(dim=-1)
+
+    # Calculate KL divergence
+    kldiv = F.kl_div(
+        torch.log_softmax(pred, dim=-1),
+        torch.softmax(target, dim=-1),
+        reduction="none",
+        log_target=False,
+    ).sum(dim=-1)
+
+    # Calculate correlation coefficient
+    covariance = (pred_centered * target_centered).sum(dim=-1)
+    cc = covariance / (torch.sqrt(pred_squared_sum) * torch.sqrt(target_squared_sum) + eps)
+
+    # Calculate NSS score, with the unbiased standard deviation of the prediction
+    pred_std = torch.sqrt(pred_squared_sum / (n_pixels - 1))
+    pred_target_sum = (pred_centered * target).sum(dim=-1) / (pred_std + eps)
+    nss = pred_target_sum / (target_sum + eps)
+
+    return kldiv, cc, nss
+
+
+def _get_sim(pred: torch.Tensor, target: torch.Tensor, eps: float) -> torch.Tensor:
+    """
+    Calculate the similarity between saliency maps.
+
+    Args:
+        pred (torch.Tensor): The predicted saliency maps, of shape (..., H, W).
+        target (torch.Tensor): The target saliency maps, of shape (..., H, W).
+        eps (float): The epsilon value to avoid division by zero.
+
+    Returns:
+        torch.Tensor: The similarity per map.
+    """
+    pred = pred / (pred.sum(dim=(-2, -1), keepdim=True) + eps)
+    target = target / (target.sum(dim=(-2, -1), keepdim=True) + eps)
+
+    return torch.minimum(pred, target).sum(dim=(-2, -1))
+
+
+def _get_information_gain(
+    pred: torch.Tensor, target: torch.Tensor, center_bias_prior: torch.Tensor, eps: float
+) -> torch.Tensor:
+    """
+    Calculate the information gain over a center bias prior.
+
+    Args:
+        pred (torch.Tensor): The predicted saliency maps, of shape (..., H, W).
+        target (torch.Tensor): The target fixation maps, of shape (..., H, W).
+        center_bias_prior (torch.Tensor): The center bias prior, broadcastable to the predictions.
+        eps (float): The epsilon value to avoid division by zero.
+
+    Returns:
+        torch.Tensor: The information gain per map.
+    """
+    pred = pred / (pred.sum(dim=(-2, -1), keepdim=True) + eps)
+    center_bias_prior = center_bias_prior / (
+        center_bias_prior.sum(dim=(-2, -1), keepdim=True) + eps
+    )
+    log_likelihood_gain = torch.log2(pred + eps) - torch.log2(center_bias_prior + eps)
+
+    return (log_likelihood_gain * target).sum(dim=(-2, -1)) / target.sum(dim=(-2, -1))
 
 
 class Metrics:
@@ -8,131 +100,69 @@ class Metrics:
         super(Metrics, self).__init__()
         self.eps = eps
 
-    def _reshape_4d(self, pred: torch.Tensor, target: torch.Tensor):
-        if pred.dim() == 4:
-            batch_size, sequence_length, height, width = pred.shape
-            pred = pred.view(batch_size * sequence_length, height, width)
-            target = target.view(batch_size * sequence_length, height, width)
-        return pred, target
-
-    def _normalize_map(self, saliency_map: torch.Tensor) -> torch.Tensor:
-        normalized = saliency_map / (
-            saliency_map.sum(dim=(-2, -1), keepdim=True) + self.eps
-        )
-        return normalized
-
     def kldiv(self, pred: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
-        pred, target = self._reshape_4d(pred, target)
-
-        # Reshape as 2D tensors
-        pred = pred.view(pred.size(0), -1)
-        target = target.view(target.size(0), -1)
-
-        # Apply softmax to both predictions and targets
-        pred = torch.log_softmax(pred, dim=1)
-        target = torch.softmax(target, dim=1)
-
-        # Calculate KL divergence
-        kl = F.kl_div(
-            pred,
-            target,
-            reduction="batchmean",
-            log_target=False,
-        )
-
-        return kl
+        kldiv, _, _ = _get_kldiv_cc_nss(pred, target, self.eps)
+        return kldiv.mean()
 
     def cc(self, pred: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
-        pred, target = self._reshape_4d(pred, target)
-
-        # Calculate correlation coefficient
-        pred_mean = pred.mean(dim=(-2, -1), keepdim=True)
-        target_mean = target.mean(dim=(-2, -1), keepdim=True)
-
-        # Center the maps by subtracting their means
-        pred_centered = pred - pred_mean
-        target_centered = target - target_mean
-
-        # Calculate correlation
-        covariance = (pred_centered * target_centered).sum(dim=(-2, -1))
-        pred_variance = torch.sqrt((pred_centered**2).sum(dim=(-2, -1)))
-        target_variance = torch.sqrt((target_centered**2).sum(dim=(-2, -1)))
-        correlation_coefficient = covariance / (
-            pred_variance * target_variance + self.eps
-        )
-
-        return correlation_coefficient.mean()
+        _, cc, _ = _get_kldiv_cc_nss(pred, target, self.eps)
+        return cc.mean()
 
     def nss(self, pred: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
-        pred, target = self._reshape_4d(pred, target)
-
-        # Normalize prediction to have zero mean and unit standard deviation
-        pred_mean = pred.mean(dim=(-2, -1), keepdim=True)
-        pred_std = pred.std(dim=(-2, -1), keepdim=True)
-        pred_normalized = (pred - pred_mean) / (pred_std + self.eps)
-
-        # Calculate sum of saliency map values at fixation locations
-        pred_target_sum = (pred_normalized * target).sum(dim=(-2, -1))
-        target_sum = target.sum(dim=(-2, -1))
-
-        # Calculate NSS score
-        nss_score = pred_target_sum / (target_sum + self.eps)
-
-        return nss_score.mean()
+        _, _, nss = _get_kldiv_cc_nss(pred, target, self.eps)
+        return nss.mean()
 
     def sim(self, pred: torch.Tensor, target: torch.Tensor) -> torch.Tensor:
-        pred, target = self._reshape_4d(pred, target)
-
-        # Normalize maps
-        pred = self._normalize_map(pred)
-        target = self._normalize_map(target)
-
         # Calculate similarity
-        sim_score = torch.min(pred, target).sum(dim=(-2, -1))
+        sim_score = _get_sim(pred, target, self.eps)
         return sim_score.mean()
 
     def information_gain(
-        self, pred: torch.Tensor, target: torch.Tensor, center_bias_prior: torch.Tensor
+        self,
+        pred: torch.Tensor,
+        target: torch.Tensor,
+        center_bias_prior: torch.Tensor,
+        dim: Optional[Tuple[int, ...]] = None,
     ) -> torch.Tensor:
-        pred, target = self._reshape_4d(pred, target)
-
         center_bias_prior = center_bias_prior.unsqueeze(0).unsqueeze(0)
         center_bias_prior = F.interpolate(
             center_bias_prior,
             size=pred.shape[-2:],
             mode="bilinear",
             align_corners=False,
-        )
-
-        # Normalize predictions and center bias prior
-        pred = self._normalize_map(pred)
-        center_bias_prior = self._normalize_map(center_bias_prior)
-
-        # Calculate log-likelihood
-        pred_log_likelihood = torch.log2(pred + self.eps) * target
-        prior_log_likelihood = torch.log2(center_bias_prior + self.eps) * target
+        )[0, 0]
 
         # Calculate information gain
-        information_gain = (pred_log_likelihood - prior_log_likelihood).sum(
-            dim=(-2, -1)
-        ) / target.sum(dim=(-2, -1))
+        information_gain = _get_information_gain(
+            pred, target, center_bias_prior, self.eps
+        )
 
-        return information_gain.mean()
+        return information_gain.mean(dim=dim)
 
     def get_metrics(
         self,
         pred: torch.Tensor,
         target: torch.Tensor,
         center_bias_prior: torch.Tensor = None,
+        dim: Optional[Tuple[int, ...]] = None,
     ) -> dict:
+        # Metrics are computed per map and averaged over the given leading dimensions, or over all maps if None,
+        # so that e.g. the metrics of every frame of a sequence are obtained at once with dim=(0,)
+
+        # Calculate KL divergence, correlation coefficient and NSS score from shared statistics
+        kldiv, cc, nss = _get_kldiv_cc_nss(pred, target, self.eps)
+
+        # Calculate similarity
+        sim = _get_sim(pred, target, self.eps)
+
         metrics = {
-            "kldiv": self.kldiv(pred, target),
-            "cc": self.cc(pred, target),
-            "nss": self.nss(pred, target),
-            "sim": self.sim(pred, target),
+            "kldiv": kldiv.mean(dim=dim),
+            "cc": cc.mean(dim=dim),
+            "nss": nss.mean(dim=dim),
+            "sim": sim.mean(dim=dim),
         }
 
         if center_bias_prior is not None:
-            metrics["ig"] = self.information_gain(pred, target, center_bias_prior)
+            metrics["ig"] = self.information_gain(pred, target, center_bias_prior, dim=dim)
 
         return metrics
@@ -1,5 +1,6 @@
 import torch
 from torch import nn
+import torch.nn.functional as F
 
 
 class ConvGRU(nn.Module):
@@ -57,17 +58,29 @@ class ConvGRU(nn.Module):
         Returns:
             torch.Tensor: The new hidden state tensor.
         """
-        combined = torch.cat([x, h], dim=1)
+        # Convolve the input and the hidden state with the matching slices of each kernel rather than their
+        # concatenation, adding the bias only once
+        input_channels = self.input_channels
+        hidden_channels = self.hidden_channels
+        zr_weight = self.conv_zr.weight
+        h_weight = self.conv_h.weight
 
-        # Compute reset and update gates
-        zr = self.sigmoid(self.conv_zr(combined))
-        z, r = torch.split(zr, self.hidden_channels, dim=1)
+        # Compute reset and update gates, slicing them as views
+        zr = self.sigmoid(
+            F.conv2d(x, zr_weight[:, :input_channels], self.conv_zr.bias, padding=self.padding)
+            + F.conv2d(h, zr_weight[:, input_channels:], None, padding=self.padding)
+        )
+        z = zr[:, :hidden_channels]
+        r = zr[:, hidden_channels:]
 
         # Compute candidate hidden state
-        combined_r = torch.cat([x, r * h], dim=1)
-        h_hat = torch.tanh(self.conv_h(combined_r))
+        h_hat = torch.tanh(
+            F.conv2d(x, h_weight[:, :input_channels], self.conv_h.bias, padding=self.padding)
+            + F.conv2d(r * h, h_weight[:, input_channels:], None, padding=self.padding)
+        )
 
-        # Update hidden state
-        h_new = (1 - z) * h + z * h_hat
+        # Update hidden state, interpolating from the hidden state to the candidate in a single kernel. The gates
+        # may be in lower precision under autocast, while lerp expects matching types
+        h_new = torch.lerp(h, h_hat.to(h.dtype), z.to(h.dtype))
 
         return h_new
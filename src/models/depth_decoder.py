@@ -13,6 +13,7 @@ class DepthDecoder(nn.Module):
         features_sizes: List[int],
         output_channels: int,
         dropout_rate: float,
+        with_autocast: bool = False,
     ) -> None:
         super(DepthDecoder, self).__init__()
 
@@ -22,6 +23,7 @@ class DepthDecoder(nn.Module):
         self.features_sizes = features_sizes
         self.output_channels = output_channels
         self.dropout_rate = dropout_rate
+        self.with_autocast = with_autocast
 
         # Get the decoder layers
         in_channels_list = [features_channels_list[-1]] + hidden_channels_list[1:][::-1]
@@ -49,6 +51,9 @@ class DepthDecoder(nn.Module):
             ]
         )
 
+        # Concatenation buffers reused across inference calls, one per decoder layer
+        self.concatenation_buffers = [None] * len(self.decoder_layers)
+
         # Final layer
         final_channels = out_channels_list[-1]
         self.final_layer = nn.Sequential(
@@ -78,8 +83,49 @@ class DepthDecoder(nn.Module):
                                    to highest resolution
 
         Returns:
-            torch.Tensor: The decoded depth map
+            torch.Tensor: The decoded depth map, in the dtype of the input features
+        """
+        # Run convolutions in bfloat16 on the GPU if autocast is enabled
+        with torch.autocast(
+            device_type="cuda",
+            dtype=torch.bfloat16,
+            enabled=self.with_autocast and xs[-1].is_cuda,
+        ):
+            output = self._decode(xs)
+
+        # Keep the following computations, e.g. the losses, in the original precision
+        return output.to(xs[-1].dtype)
+
+    def _concatenate(self, i: int, x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
+        """
+        Concatenate the upsampled feature with its skip connection along the channel dimension.
+
+        Args:
+            i (int): The index of the decoder layer.
+            x (torch.Tensor): The upsampled feature.
+            y (torch.Tensor): The skip connection feature.
+
+        Returns:
+            torch.Tensor: The concatenated features.
         """
+        # Buffers cannot be overwritten while autograd may still need them, and compiled graphs already write
+        # both inputs into a single allocation
+        if torch.is_grad_enabled() or torch.compiler.is_compiling():
+            return torch.cat([x, y], dim=1)
+
+        # Otherwise write both features into the preallocated buffer of the layer
+        shape = (x.shape[0], x.shape[1] + y.shape[1], *x.shape[2:])
+        dtype = torch.promote_types(x.dtype, y.dtype)
+        buffer = self.concatenation_buffers[i]
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype or buffer.device != x.device:
+            buffer = torch.empty(shape, dtype=dtype, device=x.device, memory_format=torch.channels_last)
+            self.concatenation_buffers[i] = buffer
+        buffer[:, : x.shape[1]].copy_(x)
+        buffer[:, x.shape[1] :].copy_(y)
+
+        return buffer
+
+    def _decode(self, xs: List[torch.Tensor]) -> torch.Tensor:
         # Start with the deepest feature
         x = xs[-1]
 
@@ -94,7 +140,7 @@ class DepthDecoder(nn.Module):
             )
 
             # Concatenate and process
-            x = torch.cat([x, y], dim=1)
+            x = self._concatenate(i, x, y)
             x = decoder_layer(x)
 
         # Final upsampling to target size and processing
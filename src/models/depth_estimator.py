@@ -29,7 +29,9 @@ class DepthEstimator(nn.Module):
 
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
-        output = self.depth_anything(x)
+        # A frozen estimator needs no gradients, so its activations are not kept for the backward pass
+        with torch.set_grad_enabled(torch.is_grad_enabled() and not self.freeze):
+            output = self.depth_anything(x)
         predicted_depth = output.predicted_depth.unsqueeze(1)
 
         # max min
@@ -21,15 +21,17 @@ class DisjointSimpleNet(nn.Module):
         self.dropout_rate = dropout_rate
         self.eps = eps
 
-        # Get normalization parameters for encoder inputs
+        # Get ImageNet normalization parameters for encoder inputs, stored as a reciprocal scale and a bias
+        image_mean = torch.tensor([0.4850, 0.4560, 0.4060]).view(1, 3, 1, 1)
+        image_std = torch.tensor([0.2290, 0.2240, 0.2250]).view(1, 3, 1, 1)
         self.register_buffer(
-            "image_mean",
-            torch.tensor([0.4850, 0.4560, 0.4060]).view(1, 3, 1, 1),
+            "image_norm_scale",
+            1.0 / image_std,
             persistent=False,
         )
         self.register_buffer(
-            "image_std",
-            torch.tensor([0.2290, 0.2240, 0.2250]).view(1, 3, 1, 1),
+            "image_norm_bias",
+            -image_mean / image_std,
             persistent=False,
         )
 
@@ -50,14 +52,17 @@ class DisjointSimpleNet(nn.Module):
 
         self.sigmoid = nn.Sigmoid()
 
+        # Use channels last memory format for faster convolutions
+        self.to(memory_format=torch.channels_last)
+
     def _normalize_input(
         self,
         x: torch.Tensor,
-        mean: torch.Tensor,
-        std: torch.Tensor,
+        scale: torch.Tensor,
+        bias: torch.Tensor,
     ) -> torch.Tensor:
-        x = x.clone()
-        normalized_x = (x - mean) / (std + self.eps)
+        # Match the dtype of the input, so that half precision inputs are not promoted to full precision
+        normalized_x = torch.addcmul(bias.to(x.dtype), x, scale.to(x.dtype))
 
         return normalized_x
 
@@ -70,9 +75,11 @@ class DisjointSimpleNet(nn.Module):
         if not is_image:
             batch_size, sequence_length, channels, height, width = x.shape
             x = x.view(-1, channels, height, width)
-        x_image = self._normalize_input(x, self.image_mean, self.image_std)
+        x_image = self._normalize_input(x, self.image_norm_scale, self.image_norm_bias)
+        x_image = x_image.contiguous(memory_format=torch.channels_last)
         if is_image:
-            x_image = x_image.unsqueeze(1).repeat(1, SEQUENCE_LENGTH, 1, 1, 1)
+            # The frames are only indexed afterwards, so they do not need to be copied
+            x_image = x_image.unsqueeze(1).expand(-1, SEQUENCE_LENGTH, -1, -1, -1)
         else:
             x_image = x_image.view(batch_size, sequence_length, channels, height, width)
 
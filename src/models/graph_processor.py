@@ -1,5 +1,7 @@
 import torch
+import functools
 from torch import nn
+import torch.nn.functional as F
 from typing import List, Tuple
 
 from src.models.conv_gru import ConvGRU
@@ -42,7 +44,9 @@ class GraphProcessor(nn.Module):
         self.with_edge_features = with_edge_features
         self.with_positional_embeddings = with_positional_embeddings
         self.with_directional_kernels = with_directional_kernels
-        self.scale = channels**-0.5
+
+        # Neighbor pairs and their temporal encodings, built lazily for each sequence length, device and data type
+        self.neighbor_pairs = {}
 
         self.spatial_dropout = nn.Dropout2d(dropout_rate)
         self.temporal_dropout = nn.Dropout3d(dropout_rate)
@@ -202,6 +206,7 @@ class GraphProcessor(nn.Module):
         )
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def get_n_groups(n_channels: int, min_factor: float = 4) -> int:
         max_groups = max(1, n_channels // min_factor)
         
@@ -224,113 +229,147 @@ class GraphProcessor(nn.Module):
         """
         batch_size, channels, height, width = x.shape
 
-        query = self.intra_query_conv(x).view(batch_size, channels, -1)
-        key = self.intra_key_conv(x).view(batch_size, channels, -1)
-        value = self.intra_value_conv(x).view(batch_size, channels, -1)
-
-        attention = torch.bmm(query.transpose(1, 2), key) * self.scale
-        attention = attention - attention.max(dim=-1, keepdim=True)[0]
-        attention = torch.softmax(attention, dim=-1)
-
-        output = torch.bmm(attention, value.transpose(1, 2))
-        output = output.transpose(1, 2).view(batch_size, channels, height, width)
+        query = self.intra_query_conv(x).reshape(batch_size, channels, -1)
+        key = self.intra_key_conv(x).reshape(batch_size, channels, -1)
+        value = self.intra_value_conv(x).reshape(batch_size, channels, -1)
+
+        # Use the fused attention kernels with a single head, positions attend to each other with channels as
+        # features, which also scales the scores by the inverse square root of the channels. Transposes are free
+        # for channels last inputs
+        output = F.scaled_dot_product_attention(
+            query.transpose(-1, -2).unsqueeze(1),
+            key.transpose(-1, -2).unsqueeze(1),
+            value.transpose(-1, -2).unsqueeze(1),
+        )
+        output = output.squeeze(1).transpose(-1, -2).reshape(batch_size, channels, height, width)
         output = self.intra_output(output)
         output = self.intra_alpha * output + x
 
         return output
 
-    def _get_temporal_encoding(
-        self, relative_position: int, is_future: bool, device: torch.device
-    ) -> torch.Tensor:
+    def _get_neighbor_pairs(
+        self, sequence_length: int, device: torch.device, dtype: torch.dtype
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, int]:
         """
-        Get the temporal encoding.
-        
+        Get the pairs of nodes and neighbors, with the pairs of past neighbors first. The pairs only depend on the
+        sequence length, so they are built once on the device and cached.
+
         Args:
-            relative_position (int): The relative position.
-            is_future (bool): Whether the position is in the future.
+            sequence_length (int): The sequence length.
             device (torch.device): The device.
-            
+            dtype (torch.dtype): The data type of the temporal encodings.
+
         Returns:
-            torch.Tensor: The temporal encoding.
+            torch.Tensor: The node indices.
+            torch.Tensor: The neighbor indices.
+            torch.Tensor: The temporal encodings of the edges, of shape (n_pairs, 2, 1, 1).
+            torch.Tensor: The direction of the edges, 1 for future neighbors and 0 for past ones.
+            int: The number of pairs with a past neighbor.
         """
-        direction = torch.tensor(1.0 if is_future else -1.0, device=device)
-        distance = torch.tensor(float(abs(relative_position)), device=device)
-        temporal_encoding = torch.stack([direction, distance])
+        cache_key = (sequence_length, device, dtype)
+        if cache_key not in self.neighbor_pairs:
+            node_indices = []
+            neighbor_indices = []
+            temporal_encodings = []
+            directions = []
+            for is_future in [False, True]:
+                for offset in range(1, self.neighbor_radius + 1):
+                    for i in range(sequence_length):
+                        j = i + offset if is_future else i - offset
+                        if 0 <= j < sequence_length:
+                            node_indices.append(i)
+                            neighbor_indices.append(j)
+                            temporal_encodings.append([1.0 if is_future else -1.0, offset / self.neighbor_radius])
+                            directions.append(int(is_future))
+
+            self.neighbor_pairs[cache_key] = (
+                torch.tensor(node_indices, dtype=torch.long, device=device),
+                torch.tensor(neighbor_indices, dtype=torch.long, device=device),
+                torch.tensor(temporal_encodings, dtype=dtype, device=device).view(-1, 2, 1, 1),
+                torch.tensor(directions, dtype=torch.long, device=device),
+                directions.count(0),
+            )
 
-        return temporal_encoding
+        return self.neighbor_pairs[cache_key]
 
-    def _compute_inter_attention(
-        self, i: int, x: torch.Tensor, neighbors: List[Tuple[int, torch.Tensor]]
-    ) -> torch.Tensor:
+    def _compute_inter_attention(self, x: torch.Tensor, h: torch.Tensor) -> torch.Tensor:
         """
-        Compute the inter-attention.
-        
+        Compute the inter-attention, for all nodes and neighbors of the sequence at once.
+
         Args:
-            i (int): The index.
-            x (torch.Tensor): The input tensor.
-            neighbors (List[Tuple[int, torch.Tensor]]): The neighbors.
+            x (torch.Tensor): The input tensor of shape (batch_size, sequence_length, channels, height, width).
+            h (torch.Tensor): The neighbor tensor of shape (batch_size, sequence_length, channels, height, width).
+
+        Returns:
+            torch.Tensor: The output tensor of shape (batch_size, sequence_length, channels, height, width).
         """
-        batch_size, channels, height, width = x.shape
+        batch_size, sequence_length, channels, height, width = x.shape
+
+        node_indices, neighbor_indices, temporal_encoding, directions, n_past_pairs = self._get_neighbor_pairs(
+            sequence_length=sequence_length, device=x.device, dtype=h.dtype
+        )
+        n_pairs = len(node_indices)
+        if n_pairs == 0:
+            return torch.zeros_like(x)
+        y = h[:, neighbor_indices].flatten(0, 1)
+
+        # Concatenate temporal encoding
+        if self.with_edge_features:
+            temporal_encoding = temporal_encoding.unsqueeze(0).expand(batch_size, -1, -1, height, width)
+            y = torch.cat([y, temporal_encoding.flatten(0, 1)], dim=1)
+
+        # Concatenate positional embeddings
+        if self.with_positional_embeddings:
+            positional_embeddings = self.positional_embeddings[directions].unsqueeze(0).expand(
+                batch_size, -1, -1, -1, -1
+            )
+            y = torch.cat([y, positional_embeddings.flatten(0, 1)], dim=1)
 
-        messages = []
-        gates = []
-        for j, y in neighbors:
-            is_future = i < j
-
-            # Concatenate temporal encoding
-            if self.with_edge_features:
-                relative_position = (i - j) / self.neighbor_radius
-                temporal_encoding = self._get_temporal_encoding(
-                relative_position=relative_position, 
-                is_future=is_future, 
-                device=x.device,
-                )
-                temporal_encoding = temporal_encoding.view(1, -1, 1, 1).expand(
-                batch_size, -1, height, width
-                )
-                y = torch.cat([y, temporal_encoding], dim=1)
-
-            # Concatenate positional embeddings
-            if self.with_positional_embeddings:
-                positional_embeddings = self.positional_embeddings[int(is_future)].unsqueeze(0).expand(batch_size, -1, -1, -1)
-                y = torch.cat([y, positional_embeddings], dim=1)
-
-            y = self.inter_message_edge_conv(y)
-
-            # Optionally use directional kernels
-            if self.with_directional_kernels:
-                inter_query_conv = self.future_inter_query_conv if is_future else self.past_inter_query_conv
-                inter_key_conv = self.future_inter_key_conv if is_future else self.past_inter_key_conv
-                inter_value_conv = self.future_inter_value_conv if is_future else self.past_inter_value_conv
-            else:
-                inter_query_conv = self.inter_query_conv
-                inter_key_conv = self.inter_key_conv
-                inter_value_conv = self.inter_value_conv
-
-            # Compute attention
-            query = inter_query_conv(x).view(batch_size, channels, -1)
-            key = inter_key_conv(y).view(batch_size, channels, -1)
-            value = inter_value_conv(y).view(batch_size, channels, -1)
-
-            attention = torch.bmm(query.transpose(1, 2), key) * self.scale
-            attention = attention - attention.max(dim=-1, keepdim=True)[0]
-            attention = torch.softmax(attention, dim=-1)
-
-            message = torch.bmm(attention, value.transpose(1, 2)).transpose(1, 2)
-            message = message.view(batch_size, channels, height, width)
-            message = self.inter_output(message)
-            gate = self.inter_gate_conv(torch.cat([x, message], dim=1))
-
-            messages.append(message)
-            gates.append(gate)
-
-        if messages:
-            messages = torch.stack(messages, dim=0)
-            gates = torch.stack(gates, dim=0)
-            gated_messages = messages * gates
-            output = torch.sum(gated_messages, dim=0)
+        y = self.inter_message_edge_conv(y).view(batch_size, n_pairs, channels, height, width)
+
+        # Optionally use directional kernels, applied to the past and future pairs separately
+        if self.with_directional_kernels:
+            directional_convs = [
+                (self.past_inter_query_conv, self.past_inter_key_conv, self.past_inter_value_conv, slice(0, n_past_pairs)),
+                (self.future_inter_query_conv, self.future_inter_key_conv, self.future_inter_value_conv, slice(n_past_pairs, n_pairs)),
+            ]
         else:
-            output = torch.zeros_like(x)
+            directional_convs = [
+                (self.inter_query_conv, self.inter_key_conv, self.inter_value_conv, slice(0, n_pairs)),
+            ]
+
+        # Compute attention, queries are computed once per node and shared by its neighbors
+        queries, keys, values = [], [], []
+        for inter_query_conv, inter_key_conv, inter_value_conv, pairs in directional_convs:
+            pairs_y = y[:, pairs].flatten(0, 1)
+            query = inter_query_conv(x.flatten(0, 1)).reshape(batch_size, sequence_length, channels, -1)
+            queries.append(query[:, node_indices[pairs]])
+            keys.append(inter_key_conv(pairs_y).reshape(batch_size, -1, channels, height * width))
+            values.append(inter_value_conv(pairs_y).reshape(batch_size, -1, channels, height * width))
+        query = torch.cat(queries, dim=1) if len(queries) > 1 else queries[0]
+        key = torch.cat(keys, dim=1) if len(keys) > 1 else keys[0]
+        value = torch.cat(values, dim=1) if len(values) > 1 else values[0]
+
+        # Use the fused attention kernels, with the pairs as heads
+        message = F.scaled_dot_product_attention(
+            query.transpose(-1, -2),
+            key.transpose(-1, -2),
+            value.transpose(-1, -2),
+        )
+        message = message.transpose(-1, -2).reshape(batch_size * n_pairs, channels, height, width)
+        message = self.inter_output(message)
+
+        # The gate convolution is 1x1, so it commutes with the average pooling that follows it. Pool the node and
+        # message features first and convolve the pooled features, instead of convolving full feature maps
+        gate_conv, gate_pool, gate_activation = self.inter_gate_conv
+        pooled_x = gate_pool(x.flatten(0, 1)).view(batch_size, sequence_length, channels, 1, 1)
+        pooled_x = pooled_x[:, node_indices].flatten(0, 1)
+        gate = gate_activation(gate_conv(torch.cat([pooled_x, gate_pool(message)], dim=1)))
+
+        # Sum the gated messages of the neighbors of each node, accumulating in place into the output
+        gated_messages = (message * gate).view(batch_size, n_pairs, channels, height, width)
+        output = torch.zeros_like(x)
+        output.index_add_(1, node_indices, gated_messages.to(x.dtype))
 
         return output
 
@@ -339,44 +378,37 @@ class GraphProcessor(nn.Module):
         Forward pass of the graph processor module.
         
         Args:
-            x (torch.Tensor): The input tensor.
+            x (torch.Tensor): The input tensor of shape (batch_size, sequence_length, channels, height, width).
             
         Returns:
-            torch.Tensor: The output tensor.
+            torch.Tensor: The output tensor of shape (batch_size, sequence_length, channels, height, width).
         """
-        sequence_length, batch_size, channels, height, width = x.shape
+        batch_size, sequence_length, channels, height, width = x.shape
         h = x
 
+        # Drop channels of whole frames over the batch, dropout does not need a contiguous input
         if self.training:
-            h = h.transpose(1, 2).contiguous()
+            h = h.permute(1, 2, 0, 3, 4)
             h = self.temporal_dropout(h)
-            h = h.transpose(1, 2).contiguous()
+            h = h.permute(2, 0, 1, 3, 4)
 
+        # All nodes of the sequence are processed at once, with the sequence folded into the batch
         for _ in range(self.n_iterations):
-            new_h = []
-            for i in range(sequence_length):
-                hi = h[i]
-                if self.training:
-                    hi = self.spatial_dropout(hi)
-
-                intra_output = self._compute_intra_attention(hi)
-
-                neighbors = [
-                    (j, h[j])
-                    for j in range(sequence_length)
-                    if i != j and abs(i - j) <= self.neighbor_radius
-                ]
-                inter_output = self._compute_inter_attention(i, hi, neighbors)
-                combined_message = (
-                    self.intra_inter_alpha * intra_output
-                    + (1 - self.intra_inter_alpha) * inter_output
-                )
-                combined_message = self.message_norm(combined_message)
-
-                next_h = self.gru(combined_message, hi)
-                next_h = next_h + hi
-                new_h.append(next_h)
-
-            h = torch.stack(new_h, dim=0)
-
-        return h
\ No newline at end of file
+            hs = h.flatten(0, 1)
+            if self.training:
+                hs = self.spatial_dropout(hs)
+
+            intra_output = self._compute_intra_attention(hs)
+            inter_output = self._compute_inter_attention(hs.view_as(h), h).flatten(0, 1)
+            combined_message = (
+                self.intra_inter_alpha * intra_output
+                + (1 - self.intra_inter_alpha) * inter_output
+            )
+            combined_message = self.message_norm(combined_message)
+
+            # The GRU output is a fresh tensor, so the residual connection is added in place
+            next_h = self.gru(combined_message, hs)
+            next_h.add_(hs)
+            h = next_h.view(batch_size, sequence_length, channels, height, width)
+
+        return h
@@ -1,17 +1,36 @@
 import torch
+import functools
 from torch import nn
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from src.models.depth_decoder import DepthDecoder
 from src.models.depth_encoder import DepthEncoder
 from src.models.image_encoder import ImageEncoder
 from src.models.depth_estimator import DepthEstimator
 from src.models.graph_processor import GraphProcessor
+from src.models.pointwise_conv import PointwiseConv2d
 from src.models.livesal_decoder import LiveSALDecoder
 from src.models.spatio_temporal_mixing_module import SpatioTemporalMixingModule
 from src.config import SEQUENCE_LENGTH, IMAGE_SIZE
 
 
+def _sigmoid_normalize(x: torch.Tensor, eps: float) -> torch.Tensor:
+    """
+    Apply a sigmoid and normalize by the spatial maximum. The activation, reduction and division are fused when the
+    pipelines are compiled.
+
+    Args:
+        x (torch.Tensor): The logits, of shape (..., H, W).
+        eps (float): The epsilon value to avoid division by zero.
+
+    Returns:
+        torch.Tensor: The normalized saliency maps.
+    """
+    x = torch.sigmoid(x)
+
+    return x / (x.amax(dim=(-2, -1), keepdim=True) + eps)
+
+
 class LiveSAL(nn.Module):
     def __init__(
         self,
@@ -31,6 +50,7 @@ class LiveSAL(nn.Module):
         with_graph_directional_kernels: bool,
         with_depth_information: bool,
         depth_integration_type: str,
+        amp_dtype: str = "float32",
         eps: float = 1e-6,
     ) -> None:
         if image_n_levels < 1:
@@ -43,6 +63,8 @@ class LiveSAL(nn.Module):
             raise ValueError(f"❌ Invalid output type: {output_type}")
         if freeze_temporal_pipeline and output_type == "temporal":
             raise ValueError("❌ Cannot freeze the temporal pipeline when output type is temporal.")
+        if amp_dtype not in ["float32", "bfloat16", "float16"]:
+            raise ValueError(f"❌ Invalid mixed precision data type: {amp_dtype}")
         
         super(LiveSAL, self).__init__()
 
@@ -64,28 +86,33 @@ class LiveSAL(nn.Module):
         self.with_depth_information = with_depth_information
         self.depth_integration_type = depth_integration_type
         self.output_type = output_type
+        self.amp_dtype = amp_dtype
         self.eps = eps
 
-        # Get normalization parameters for encoder/estimator inputs
+        # Get normalization parameters for encoder/estimator inputs, precomputed for a single multiply-add
+        image_mean = torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1)
+        image_std = torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1)
         self.register_buffer(
-            "image_mean",
-            torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1),
+            "image_norm_scale",
+            1.0 / image_std,
             persistent=False,
         )
         self.register_buffer(
-            "image_std",
-            torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1),
+            "image_norm_bias",
+            -image_mean / image_std,
             persistent=False,
         )
         if with_depth_information:
+            depth_mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+            depth_std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
             self.register_buffer(
-                "depth_mean",
-                torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1),
+                "depth_norm_scale",
+                1.0 / depth_std,
                 persistent=False,
             )
             self.register_buffer(
-                "depth_std",
-                torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1),
+                "depth_norm_bias",
+                -depth_mean / depth_std,
                 persistent=False,
             )
 
@@ -113,6 +140,7 @@ class LiveSAL(nn.Module):
                     features_sizes=self.depth_encoder.features_sizes,
                     output_channels=hidden_channels,
                     dropout_rate=dropout_rate,
+                    with_autocast=True,
                 )
 
         self.image_encoder = ImageEncoder(
@@ -136,22 +164,21 @@ class LiveSAL(nn.Module):
                 new_first_conv.bias.data = first_conv.bias.data
             self.image_encoder.pnas.body.conv_0.conv = new_first_conv
 
+        # Project the features with pointwise convolutions run as matrix multiplications over the channels
         projection_in_channels_list = self.image_encoder.feature_channels_list
         self.projection_layers = nn.ModuleList([
             nn.Sequential(
-                nn.Conv2d(
+                PointwiseConv2d(
                     in_channels=in_channels,
                     out_channels=(in_channels + out_channels) // 2,
-                    kernel_size=1,
                     bias=True,
                 ),
                 nn.GroupNorm(LiveSAL.get_n_groups((in_channels + out_channels) // 2), (in_channels + out_channels) // 2),
                 nn.ReLU(inplace=True),
                 nn.Dropout2d(p=dropout_rate),
-                nn.Conv2d(
+                PointwiseConv2d(
                     in_channels=(in_channels + out_channels) // 2,
                     out_channels=out_channels,
-                    kernel_size=1,
                     bias=True,
                 ),
                 nn.GroupNorm(LiveSAL.get_n_groups(out_channels), out_channels),
@@ -206,8 +233,6 @@ class LiveSAL(nn.Module):
             dropout_rate=dropout_rate,
         )
 
-        self.sigmoid = nn.Sigmoid()
-
         if self.freeze_temporal_pipeline:
             if with_depth_information:
                     for param in self.depth_encoder.parameters():
@@ -235,7 +260,60 @@ class LiveSAL(nn.Module):
             for param in self.spatio_temporal_mixing_module.parameters():
                 param.requires_grad = False
 
+        # Keep the frozen submodules in evaluation mode from the start
+        self.train()
+
+        # Use channels last memory format for faster convolutions
+        self.to(memory_format=torch.channels_last)
+
+        # Compiled pipelines for image and video inputs, only set once compiled
+        self.compiled_image_pipelines = None
+        self.compiled_video_pipelines = None
+
+        # Streams the projections run on, only created on the first forward pass on a CUDA device
+        self.projection_streams = None
+
+        # Replayed forward passes of the graph processors and the batch size they were captured for, only set once
+        # captured
+        self.graphed_forwards = {}
+        self.graphed_batch_size = None
+
+        # CUDA graph of the inference forward pass, only set once captured
+        self.cuda_graph = None
+        self.static_input = None
+        self.static_outputs = None
+
+    def train(self, mode: bool = True) -> "LiveSAL":
+        """
+        Set the model in training or evaluation mode. Fully frozen submodules always stay in evaluation mode, so
+        that their dropout is disabled and their normalization statistics are not updated.
+
+        Args:
+            mode (bool, optional): Whether to set training mode. Defaults to True.
+
+        Returns:
+            LiveSAL: The model.
+        """
+        # Set the mode of each submodule directly, so that the frozen ones are not walked a second time to put them
+        # back in evaluation mode
+        self.training = mode
+        for module in self.children():
+            module.train(mode and not self._is_frozen(module))
+
+        return self
+
     @staticmethod
+    def _is_frozen(module: nn.Module) -> bool:
+        has_parameters = False
+        for param in module.parameters():
+            if param.requires_grad:
+                return False
+            has_parameters = True
+
+        return has_parameters
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
     def get_n_groups(n_channels: int, min_factor: float = 4) -> int:
         max_groups = max(1, n_channels // min_factor)
         
@@ -249,23 +327,94 @@ class LiveSAL(nn.Module):
     def _normalize_input(
         self,
         x: torch.Tensor,
-        mean: torch.Tensor,
-        std: torch.Tensor,
+        scale: torch.Tensor,
+        bias: torch.Tensor,
     ) -> torch.Tensor:
-        x = x.clone()
-        normalized_x = (x - mean) / (std + self.eps)
+        # Match the dtype of the input, so that half precision inputs are not promoted to full precision
+        normalized_x = torch.addcmul(bias.to(x.dtype), x, scale.to(x.dtype))
 
         return normalized_x
+
+    def _normalize_inputs(self, x: torch.Tensor) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+        if not self.with_depth_information:
+            return self._normalize_input(x, self.image_norm_scale, self.image_norm_bias), None
+
+        # Normalize the encoder and estimator inputs in a single pass over the input, along a new leading dimension
+        shape = (2, *([1] * (x.dim() - 3)), 3, 1, 1)
+        scale = torch.stack([self.image_norm_scale, self.depth_norm_scale]).view(shape)
+        bias = torch.stack([self.image_norm_bias, self.depth_norm_bias]).view(shape)
+        x_image, x_depth = self._normalize_input(x.unsqueeze(0), scale, bias).unbind(0)
+
+        return x_image, x_depth
     
     def _normalize_spatial_dimensions(self, x: torch.Tensor) -> torch.Tensor:
-        x = x.clone()
-        batch_size, channels , height, width = x.size()
-        x = x.view(batch_size, channels, -1)
-        x = x / (x.max(dim=2, keepdim=True)[0] + self.eps)
-        x = x.view(batch_size, channels, height, width)
+        # Reduce over the spatial dimensions directly, without flattening them or computing the argmax
+        x = x / (x.amax(dim=(-2, -1), keepdim=True) + self.eps)
 
         return x
 
+    def _expand_to_sequence(self, features: torch.Tensor) -> torch.Tensor:
+        # Expand image features over the sequence without repeating them first, the single copy done by the reshape
+        # is made in the channels last memory format
+        batch_size, channels, height, width = features.shape
+        features = (
+            features.permute(0, 2, 3, 1)
+            .unsqueeze(1)
+            .expand(-1, SEQUENCE_LENGTH, -1, -1, -1)
+            .reshape(-1, height, width, channels)
+            .permute(0, 3, 1, 2)
+        )
+
+        return features
+
+    def _pool_sequence(self, features: torch.Tensor) -> torch.Tensor:
+        # Average over the sequence with the channels as the last dimension, so that the pooled features are in the
+        # channels last memory format expected by the decoders, which a mean over the sequence dimension of the
+        # (batch_size, sequence_length, channels, height, width) view would not give
+        pooled_features = (
+            features.permute(0, 2, 3, 1)
+            .unflatten(0, (-1, SEQUENCE_LENGTH))
+            .mean(dim=1)
+            .permute(0, 3, 1, 2)
+        )
+
+        return pooled_features
+
+    def _project_features_list(self, features_list: List[torch.Tensor]) -> List[torch.Tensor]:
+        # Compiled graphs, captured CUDA graphs and inputs on other devices run the projections one after the other
+        if (
+            not features_list[0].is_cuda
+            or torch.compiler.is_compiling()
+            or torch.cuda.is_current_stream_capturing()
+        ):
+            return [
+                projection_layer(features)
+                for features, projection_layer in zip(features_list, self.projection_layers)
+            ]
+
+        # Run each projection on its own stream, so that the small projections of the coarser levels overlap
+        # instead of being bound by their launch latency
+        device = features_list[0].device
+        if self.projection_streams is None:
+            self.projection_streams = [torch.cuda.Stream(device=device) for _ in self.projection_layers]
+        current_stream = torch.cuda.current_stream(device)
+        for stream in self.projection_streams:
+            stream.wait_stream(current_stream)
+
+        projected_features_list = []
+        for features, projection_layer, stream in zip(features_list, self.projection_layers, self.projection_streams):
+            with torch.cuda.stream(stream):
+                projected_features = projection_layer(features)
+            # Keep the memory of the tensors shared between streams until every stream using them is done
+            features.record_stream(stream)
+            projected_features.record_stream(current_stream)
+            projected_features_list.append(projected_features)
+
+        for stream in self.projection_streams:
+            current_stream.wait_stream(stream)
+
+        return projected_features_list
+
     def _get_image_features_list(
         self, x: torch.Tensor, is_image: bool
     ) -> List[torch.Tensor]:
@@ -274,29 +423,18 @@ class LiveSAL(nn.Module):
             batch_size, sequence_length, channels, height, width = x.shape
             x = x.view(-1, channels, height, width)
 
-        # Normalize and get image features
-        if self.with_depth_information and self.depth_integration_type == "early":
-            x_image = self._normalize_input(x[:, :3], self.image_mean, self.image_std)
-            x_image = torch.cat([x_image, x[:, 3:]], dim=1)
-        else:
-            x_image = self._normalize_input(x, self.image_mean, self.image_std)
-        image_features_list = self.image_encoder(x_image)
+        # Get image features from the normalized input
+        x = x.contiguous(memory_format=torch.channels_last)
+        image_features_list = self.image_encoder(x)
 
         # Project features
-        for i, projection_layer in enumerate(self.projection_layers):
-            image_features_list[i] = projection_layer(image_features_list[i])
+        image_features_list = self._project_features_list(image_features_list)
 
         # Expand features for image inputs to match the sequence length
         if is_image:
-            new_image_features_list = []
-            for image_features in image_features_list:
-                image_features = image_features.unsqueeze(1).repeat(
-                    1, SEQUENCE_LENGTH, 1, 1, 1
-                )
-                batch_size, sequence_length, channels, height, width = image_features.shape
-                image_features = image_features.view(-1, channels, height, width)
-                new_image_features_list.append(image_features)
-            image_features_list = new_image_features_list
+            image_features_list = [
+                self._expand_to_sequence(image_features) for image_features in image_features_list
+            ]
 
         return image_features_list
     
@@ -304,18 +442,21 @@ class LiveSAL(nn.Module):
         self, features: torch.Tensor, graph_processor: GraphProcessor
     ) -> torch.Tensor:
         batch_size_sequence_length, channels, height, width = features.shape
-        transformed_features = (
-            features.view(-1, SEQUENCE_LENGTH, channels, height, width)
-            .transpose(0, 1)
-            .contiguous()
-        )
 
-        graph_features = graph_processor(transformed_features)
-        graph_features = (
-            graph_features.transpose(0, 1)
-            .contiguous()
-            .view(batch_size_sequence_length, channels, height, width)
-        )
+        # The graph processor takes the features in batch major order, so they are only viewed and never copied
+        graph_features = features.view(-1, SEQUENCE_LENGTH, channels, height, width)
+
+        # Replay the captured graph only on inputs it was captured for, since it copies them into static buffers
+        graphed_forward = self.graphed_forwards.get(graph_processor)
+        if (
+            graphed_forward is not None
+            and graph_features.shape[0] == self.graphed_batch_size
+            and graph_processor.training
+        ):
+            graph_features = graphed_forward(graph_features)
+        else:
+            graph_features = graph_processor(graph_features)
+        graph_features = graph_features.reshape(batch_size_sequence_length, channels, height, width)
 
         # Add residual connection
         graph_features = graph_features + features
@@ -329,25 +470,15 @@ class LiveSAL(nn.Module):
             batch_size, sequence_length, channels, height, width = x.shape
             x = x.view(-1, channels, height, width)
 
-        # Normalize and get depth features
-        x_depth = self._normalize_input(x, self.depth_mean, self.depth_std)
-        depth_estimation = self.depth_estimator(x_depth)
+        # Get depth features from the normalized input
+        x = x.contiguous(memory_format=torch.channels_last)
+        depth_estimation = self.depth_estimator(x)
         depth_features_list = self.depth_encoder(depth_estimation)
 
         if is_image:
-            new_depth_features_list = []
-            for depth_features in depth_features_list:
-                depth_features = depth_features.unsqueeze(1).repeat(
-                    1, SEQUENCE_LENGTH, 1, 1, 1
-                )
-                batch_size, sequence_length, channels, height, width = (
-                    depth_features.shape
-                )
-                depth_features = depth_features.view(
-                    -1, channels, height, width
-                )
-                new_depth_features_list.append(depth_features)
-            depth_features_list = new_depth_features_list
+            depth_features_list = [
+                self._expand_to_sequence(depth_features) for depth_features in depth_features_list
+            ]
 
         return depth_features_list
     
@@ -356,20 +487,19 @@ class LiveSAL(nn.Module):
         x: torch.Tensor,
         is_image: bool,
     ):
+        x_image, x_depth = self._normalize_inputs(x)
         if self.with_depth_information and self.depth_integration_type == "early":
             if is_image:
-                x_depth = self._normalize_input(x, self.depth_mean, self.depth_std)
                 depth_estimation = self.depth_estimator(x_depth)
-                x = torch.cat([x, depth_estimation], dim=1)
+                x_image = torch.cat([x_image, depth_estimation], dim=1)
             else:
                 batch_size, sequence_length, channels, height, width = x.shape
-                x_flat = x.view(-1, channels, height, width)
-                x_depth = self._normalize_input(x_flat, self.depth_mean, self.depth_std)
-                depth_estimation = self.depth_estimator(x_depth)
+                x_depth_flat = x_depth.reshape(-1, channels, height, width)
+                depth_estimation = self.depth_estimator(x_depth_flat)
                 depth_estimation = depth_estimation.view(batch_size, sequence_length, 1, height, width)
-                x = torch.cat([x, depth_estimation], dim=2)
+                x_image = torch.cat([x_image, depth_estimation], dim=2)
         # Get image features
-        image_features_list = self._get_image_features_list(x, is_image)
+        image_features_list = self._get_image_features_list(x_image, is_image)
 
         # Process features if needed
         if self.with_graph_processing:
@@ -379,7 +509,7 @@ class LiveSAL(nn.Module):
             )
 
         if self.with_depth_information and self.depth_integration_type == "late":
-            depth_encoded_features_list = self._get_depth_features_list(x, is_image)
+            depth_encoded_features_list = self._get_depth_features_list(x_depth, is_image)
             if self.with_graph_processing:
                 depth_encoded_features_list[-1] = self._get_graph_features(
                     features=depth_encoded_features_list[-1],
@@ -389,21 +519,16 @@ class LiveSAL(nn.Module):
         else:
             depth_decoded_features = None
 
-        # Get temporal output
+        # Get temporal features, the temporal output is only computed from them by callers that return it
         temporal_features = self.temporal_decoder(image_features_list, depth_decoded_features)
-        temporal_output = self.sigmoid(temporal_features)
-        temporal_output = self._normalize_spatial_dimensions(temporal_output)
 
-        return image_features_list, depth_decoded_features, temporal_features, temporal_output
+        return image_features_list, depth_decoded_features, temporal_features
 
     def _forward_global_pipeline(self, image_features_list: List[torch.Tensor], depth_decoded_features: Optional[torch.Tensor], temporal_features: torch.Tensor):
-        # Reshape tensors
-        image_features_list = [image_features.view(-1, SEQUENCE_LENGTH, *image_features.shape[1:]) for image_features in image_features_list]
         # Pool temporal features
-        pooled_image_features_list = [torch.mean(image_features, dim=1) for image_features in image_features_list]
+        pooled_image_features_list = [self._pool_sequence(image_features) for image_features in image_features_list]
         if depth_decoded_features is not None:
-            depth_decoded_features = depth_decoded_features.view(-1, SEQUENCE_LENGTH, *depth_decoded_features.shape[1:])
-            pooled_depth_decoded_features = torch.mean(depth_decoded_features, dim=1)
+            pooled_depth_decoded_features = self._pool_sequence(depth_decoded_features)
         else:
             pooled_depth_decoded_features = None
 
@@ -422,7 +547,8 @@ class LiveSAL(nn.Module):
     
     def _forward_global_direct_pipeline(self, x: torch.Tensor, is_image: bool):
         # Get image features
-        image_features_list = self._get_image_features_list(x, is_image)
+        x_image, x_depth = self._normalize_inputs(x)
+        image_features_list = self._get_image_features_list(x_image, is_image)
 
         # Process features if needed
         if self.with_graph_processing:
@@ -432,7 +558,7 @@ class LiveSAL(nn.Module):
             )
 
         if self.with_depth_information and self.depth_integration_type == "late":
-            depth_encoded_features_list = self._get_depth_features_list(x, is_image)
+            depth_encoded_features_list = self._get_depth_features_list(x_depth, is_image)
             if self.with_graph_processing:
                 depth_encoded_features_list[-1] = self._get_graph_features(
                     features=depth_encoded_features_list[-1],
@@ -442,20 +568,16 @@ class LiveSAL(nn.Module):
         else:
             depth_decoded_features = None
 
-        # Reshape tensors
-        image_features_list = [image_features.view(-1, SEQUENCE_LENGTH, *image_features.shape[1:]) for image_features in image_features_list]
         # Pool temporal features
-        pooled_image_features_list = [torch.mean(image_features, dim=1) for image_features in image_features_list]
+        pooled_image_features_list = [self._pool_sequence(image_features) for image_features in image_features_list]
         if depth_decoded_features is not None:
-            depth_decoded_features = depth_decoded_features.view(-1, SEQUENCE_LENGTH, *depth_decoded_features.shape[1:])
-            pooled_depth_decoded_features = torch.mean(depth_decoded_features, dim=1)
+            pooled_depth_decoded_features = self._pool_sequence(depth_decoded_features)
         else:
             pooled_depth_decoded_features = None
 
         # Get global features
         global_features = self.global_decoder(pooled_image_features_list, pooled_depth_decoded_features)
-        global_output = self.sigmoid(global_features)
-        global_output = self._normalize_spatial_dimensions(global_output).squeeze(1)
+        global_output = _sigmoid_normalize(global_features, self.eps).squeeze(1)
 
         return global_output
 
@@ -481,13 +603,163 @@ class LiveSAL(nn.Module):
             )
         is_image = x.dim() == 4
 
-        if self.output_type == "global":
-            image_features_list, depth_decoded_features, temporal_features, _ = self._forward_temporal_pipeline(x, is_image)
-            global_output = self._forward_global_pipeline(image_features_list, depth_decoded_features, temporal_features)
-            return None, global_output
-        elif self.output_type == "temporal":
-            _, _, _, temporal_output = self._forward_temporal_pipeline(x, is_image)
-            return temporal_output, None
-        elif self.output_type == "global_direct":
-            global_output = self._forward_global_direct_pipeline(x, is_image)
-            return None, global_output
\ No newline at end of file
+        # Dispatch to the pipelines compiled for the rank of the input, if any
+        if is_image and self.compiled_image_pipelines is not None:
+            return self.compiled_image_pipelines(x)
+        if not is_image and self.compiled_video_pipelines is not None:
+            return self.compiled_video_pipelines(x)
+
+        return self._forward_pipelines(x, is_image)
+
+    def _forward_pipelines(self, x: torch.Tensor, is_image: bool) -> Tuple[Optional[torch.Tensor], Optional[torch.Tensor]]:
+        # Optionally run the whole pipeline in mixed precision, autocast keeps the normalizations and the softmax
+        # in full precision, and the outputs are returned in full precision
+        with torch.autocast(
+            device_type=x.device.type,
+            dtype=getattr(torch, self.amp_dtype),
+            enabled=self.amp_dtype != "float32",
+        ):
+            if self.output_type == "global":
+                image_features_list, depth_decoded_features, temporal_features = self._forward_temporal_pipeline(x, is_image)
+                global_output = self._forward_global_pipeline(image_features_list, depth_decoded_features, temporal_features)
+                return None, global_output.float()
+            elif self.output_type == "temporal":
+                _, _, temporal_features = self._forward_temporal_pipeline(x, is_image)
+                temporal_output = _sigmoid_normalize(temporal_features, self.eps)
+                return temporal_output.float(), None
+            elif self.output_type == "global_direct":
+                global_output = self._forward_global_direct_pipeline(x, is_image)
+                return None, global_output.float()
+
+    def _forward_image_pipelines(self, x: torch.Tensor) -> Tuple[Optional[torch.Tensor], Optional[torch.Tensor]]:
+        return self._forward_pipelines(x, is_image=True)
+
+    def _forward_video_pipelines(self, x: torch.Tensor) -> Tuple[Optional[torch.Tensor], Optional[torch.Tensor]]:
+        return self._forward_pipelines(x, is_image=False)
+
+    def compile_pipelines(self, mode: Optional[str] = None) -> None:
+        """
+        Compile the pipelines separately for image and video inputs. Each compiled function only ever sees inputs
+        of one rank, so it is specialized to static shapes once rather than recompiled when the input rank changes.
+        The parameters and their names are left unchanged.
+
+        Args:
+            mode (Optional[str], optional): The compilation mode, e.g. "reduce-overhead" to also replay the whole
+                forward and backward passes of the pipelines as CUDA graphs. Defaults to None, the default mode.
+        """
+        self.compiled_image_pipelines = torch.compile(self._forward_image_pipelines, dynamic=False, mode=mode)
+        self.compiled_video_pipelines = torch.compile(self._forward_video_pipelines, dynamic=False, mode=mode)
+
+    def capture_graph_processors(self, batch_size: int) -> None:
+        """
+        Capture the forward and backward passes of the graph processors in CUDA graphs, so that the many small
+        kernels of their message passing iterations are replayed with a single launch. The graphs are only replayed
+        in training mode on inputs of the given batch size, and the regular forward pass is used otherwise. Frozen
+        graph processors are not captured.
+
+        Args:
+            batch_size (int): The batch size of the inputs to replay the graphs on.
+        """
+        device = self.image_norm_scale.device
+        if device.type != "cuda":
+            raise ValueError(f"❌ CUDA graphs require the model on a CUDA device, got {device}.")
+        if self.compiled_image_pipelines is not None or self.compiled_video_pipelines is not None:
+            raise ValueError("❌ CUDA graphs cannot be captured for compiled pipelines.")
+        if not self.training:
+            raise ValueError("❌ CUDA graphs of the graph processors can only be captured in training mode.")
+        if not self.with_graph_processing:
+            return
+
+        graph_processors = [self.image_graph_processor]
+        if self.with_depth_information and self.depth_integration_type == "late":
+            graph_processors.append(self.depth_graph_processor)
+        graph_processors = [
+            graph_processor
+            for graph_processor in graph_processors
+            if any(param.requires_grad for param in graph_processor.parameters())
+        ]
+        if not graph_processors:
+            return
+
+        # Sample inputs have the channels last layout and the gradient requirement of the projected features
+        sample_args = tuple(
+            (
+                torch.randn(
+                    batch_size * SEQUENCE_LENGTH,
+                    graph_processor.channels,
+                    graph_processor.size,
+                    graph_processor.size,
+                    device=device,
+                )
+                .contiguous(memory_format=torch.channels_last)
+                .view(batch_size, SEQUENCE_LENGTH, graph_processor.channels, graph_processor.size, graph_processor.size)
+                .requires_grad_(),
+            )
+            for graph_processor in graph_processors
+        )
+
+        # Capture with the same mixed precision as the forward pass, the graphs cannot use the autocast cache
+        with torch.autocast(
+            device_type=device.type,
+            dtype=getattr(torch, self.amp_dtype),
+            enabled=self.amp_dtype != "float32",
+            cache_enabled=False,
+        ):
+            torch.cuda.make_graphed_callables(tuple(graph_processors), sample_args, allow_unused_input=True)
+
+        # Keep the regular forward passes of the graph processors and dispatch to the replayed ones explicitly
+        for graph_processor in graph_processors:
+            self.graphed_forwards[graph_processor] = graph_processor.forward
+            del graph_processor.forward
+        self.graphed_batch_size = batch_size
+
+    @torch.inference_mode()
+    def capture_cuda_graph(self, sample_input: torch.Tensor, n_warmup_steps: int = 3) -> None:
+        """
+        Capture the inference forward pass in a CUDA graph, so that it is replayed with a single launch. All shapes
+        of the model are fixed by the input shape, which must then stay the same.
+
+        Args:
+            sample_input (torch.Tensor): An input with the shape and device of the inputs to replay the graph on.
+            n_warmup_steps (int, optional): The number of forward passes run before the capture. Defaults to 3.
+        """
+        if not sample_input.is_cuda:
+            raise ValueError(f"❌ CUDA graphs require an input on a CUDA device, got {sample_input.device}.")
+        if self.training:
+            raise ValueError("❌ CUDA graphs can only be captured in evaluation mode.")
+
+        self.static_input = sample_input.clone()
+
+        # Warm up on a side stream, which also builds the lazily created tensors outside of the graph
+        stream = torch.cuda.Stream(device=sample_input.device)
+        stream.wait_stream(torch.cuda.current_stream(sample_input.device))
+        with torch.cuda.stream(stream):
+            for _ in range(n_warmup_steps):
+                self(self.static_input)
+        torch.cuda.current_stream(sample_input.device).wait_stream(stream)
+
+        self.cuda_graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(self.cuda_graph):
+            self.static_outputs = self(self.static_input)
+
+    @torch.inference_mode()
+    def forward_captured(self, x: torch.Tensor) -> Tuple[Optional[torch.Tensor], Optional[torch.Tensor]]:
+        """
+        Run the inference forward pass by replaying the captured CUDA graph, or the regular forward pass if no graph
+        was captured for inputs of this shape.
+
+        Args:
+            x (torch.Tensor): The input tensor.
+
+        Returns:
+            Optional[torch.Tensor]: The temporal output.
+            Optional[torch.Tensor]: The global output.
+        """
+        if self.cuda_graph is None or x.shape != self.static_input.shape or x.device != self.static_input.device:
+            return self(x)
+
+        self.static_input.copy_(x)
+        self.cuda_graph.replay()
+
+        # The outputs of the graph are overwritten by the next replay
+        return tuple(output.clone() if output is not None else None for output in self.static_outputs)
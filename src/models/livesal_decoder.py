@@ -1,4 +1,5 @@
 import torch
+import functools
 import torch.nn as nn
 from typing import List, Optional
 
@@ -82,6 +83,7 @@ class LiveSALDecoder(nn.Module):
         )
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def get_n_groups(n_channels: int, min_factor: float = 4) -> int:
         max_groups = max(1, n_channels // min_factor)
         
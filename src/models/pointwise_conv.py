@@ -0,0 +1,44 @@
+import torch
+from torch import nn
+import torch.nn.functional as F
+
+
+class PointwiseConv2d(nn.Conv2d):
+    """
+    A 1x1 convolution computed as a single matrix multiplication over the channels of every pixel. Parameters are
+    the same as those of the equivalent convolution.
+    """
+
+    def __init__(self, in_channels: int, out_channels: int, bias: bool = True) -> None:
+        """
+        Initialize the pointwise convolution.
+
+        Args:
+            in_channels (int): The number of input channels.
+            out_channels (int): The number of output channels.
+            bias (bool, optional): Whether to use a bias. Defaults to True.
+        """
+        super(PointwiseConv2d, self).__init__(
+            in_channels=in_channels,
+            out_channels=out_channels,
+            kernel_size=1,
+            bias=bias,
+        )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Forward pass of the pointwise convolution.
+
+        Args:
+            x (torch.Tensor): The input tensor, preferably in channels last memory format.
+
+        Returns:
+            torch.Tensor: The output tensor, in channels last memory format.
+        """
+        # The channels last layout is a contiguous (batch_size, height, width, channels) matrix, so the permutations
+        # are free and the product runs as one GEMM
+        x = x.permute(0, 2, 3, 1)
+        x = F.linear(x, self.weight.view(self.out_channels, self.in_channels), self.bias)
+        x = x.permute(0, 3, 1, 2)
+
+        return x
@@ -101,6 +101,7 @@ class SpatioTemporalMixingModule(nn.Module):
         # Start with the last 2 encoded features and go backwards, concatenating the temporal and global saliency
         # features with the encoded features for the next steps
         x = encoded_features_list[-1]
+        saliency_features = torch.cat([global_features, temporal_features], dim=1)
         for i, decoder_layer in enumerate(self.decoder_layers):
             y = encoded_features_list[-(i + 2)]
             # Start with the first layer, where we only need to resize the encoded features
@@ -110,26 +111,18 @@ class SpatioTemporalMixingModule(nn.Module):
                 )
                 x = torch.cat([x, y], dim=1)
             # For the other layers, we also need to resize the temporal and global features and concatenate them with
-            # the encoded features
+            # the encoded features, both are resized at once
             else:
                 x = nn.functional.interpolate(
                     x, size=y.shape[-2:], mode="bilinear", align_corners=False
                 )
-                resized_global_features = nn.functional.interpolate(
-                    global_features,
+                resized_saliency_features = nn.functional.interpolate(
+                    saliency_features,
                     size=y.shape[-2:],
                     mode="bilinear",
                     align_corners=False,
                 )
-                resized_temporal_features = nn.functional.interpolate(
-                    temporal_features,
-                    size=y.shape[-2:],
-                    mode="bilinear",
-                    align_corners=False,
-                )
-                x = torch.cat(
-                    [x, y, resized_global_features, resized_temporal_features], dim=1
-                )
+                x = torch.cat([x, y, resized_saliency_features], dim=1)
             x = decoder_layer(x)
 
         # Get the final output
@@ -58,15 +58,17 @@ class TempSAL(nn.Module):
         self.dropout_rate = dropout_rate
         self.eps = eps
 
-        # Get normalization parameters for encoder inputs
+        # Get normalization parameters for encoder inputs as a scale and a bias, applied in one multiply-add
+        image_mean = torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1)
+        image_std = torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1)
         self.register_buffer(
-            "image_mean",
-            torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1),
+            "image_norm_scale",
+            1.0 / image_std,
             persistent=False,
         )
         self.register_buffer(
-            "image_std",
-            torch.tensor([0.5, 0.5, 0.5]).view(1, 3, 1, 1),
+            "image_norm_bias",
+            -image_mean / image_std,
             persistent=False,
         )
 
@@ -112,29 +114,30 @@ class TempSAL(nn.Module):
             for param in self.spatio_temporal_mixing_module.parameters():
                 param.requires_grad = False
 
+        # Use channels last memory format for faster convolutions
+        self.to(memory_format=torch.channels_last)
+
     def _normalize_input(
         self,
         x: torch.Tensor,
-        mean: torch.Tensor,
-        std: torch.Tensor,
+        scale: torch.Tensor,
+        bias: torch.Tensor,
     ) -> torch.Tensor:
-        x = x.clone()
-        normalized_x = (x - mean) / (std + self.eps)
+        # Match the dtype of the input, so that half precision inputs are not promoted to full precision
+        normalized_x = torch.addcmul(bias.to(x.dtype), x, scale.to(x.dtype))
 
         return normalized_x
 
     def _normalize_spatial_dimensions(self, x: torch.Tensor) -> torch.Tensor:
-        x = x.clone()
-        batch_size, channels, height, width = x.size()
-        x = x.view(batch_size, channels, -1)
-        x = x / (x.max(dim=2, keepdim=True)[0] + self.eps)
-        x = x.view(batch_size, channels, height, width)
+        # Reduce over the spatial dimensions directly, without flattening them or computing the argmax
+        x = x / (x.amax(dim=(-2, -1), keepdim=True) + self.eps)
 
         return x
 
     def _forward_temporal_pipeline(self, x: torch.Tensor) -> torch.Tensor:
         # Encode the input image
-        x_image = self._normalize_input(x, self.image_mean, self.image_std)
+        x_image = self._normalize_input(x, self.image_norm_scale, self.image_norm_bias)
+        x_image = x_image.contiguous(memory_format=torch.channels_last)
         encoded_features_list = self.image_encoder(x_image)
 
         # Decode temporal features and get temporal output
@@ -161,7 +164,8 @@ class TempSAL(nn.Module):
             self, x: torch.Tensor
     ) -> torch.Tensor:
         # Encode the input image
-        x_image = self._normalize_input(x, self.image_mean, self.image_std)
+        x_image = self._normalize_input(x, self.image_norm_scale, self.image_norm_bias)
+        x_image = x_image.contiguous(memory_format=torch.channels_last)
         encoded_features_list = self.image_encoder(x_image)
 
         # Decode global features and get global output
@@ -12,9 +12,11 @@ import platform
 import multiprocessing
 import lightning.pytorch as pl
 from lightning.pytorch.loggers import WandbLogger
-from lightning.pytorch.callbacks import ModelCheckpoint
+from lightning.pytorch.plugins.io import AsyncCheckpointIO
+from lightning.pytorch.callbacks import ModelCheckpoint, TQDMProgressBar
 
 from src.utils.random import set_seed
+from src.utils.backend import set_backends
 from src.models.tempsal import TempSAL
 from src.utils.parser import get_config
 from src.utils.file import get_paths_recursive
@@ -23,6 +25,7 @@ from src.lightning_models.lightning_model import LightningModel
 from src.config import (
     SEED,
     N_WORKERS,
+    PROGRESS_BAR_REFRESH_RATE,
     CONFIG_PATH,
     MODELS_PATH,
     CHECKPOINTS_PATH,
@@ -60,6 +63,7 @@ def _get_data_module(
         with_transforms=with_transforms,
         n_workers=N_WORKERS,
         seed=SEED,
+        with_prefetcher=True,
     )
     return data_module
 
@@ -101,6 +105,7 @@ def main() -> None:
     if platform.system() != "Windows":
         multiprocessing.set_start_method("forkserver", force=True)
     set_seed(SEED)
+    set_backends()
 
     # Parse arguments
     args = parse_arguments()
@@ -124,6 +129,7 @@ def main() -> None:
     output_type = str(config["output_type"])
     dropout_rate = float(config["dropout_rate"])
     with_checkpoint = bool(config["with_checkpoint"])
+    with_compile = bool(config["with_compile"])
     print(f"✅ Using config file at {Path(config_file_path).resolve()}")
 
     # Get dataset
@@ -144,6 +150,12 @@ def main() -> None:
         output_type=output_type,
         dropout_rate=dropout_rate,
     )
+
+    # Optionally compile the model in place, fusing its pointwise operations while keeping the parameter names of
+    # the checkpoints unchanged
+    if with_compile:
+        model.compile(dynamic=False)
+
     if with_checkpoint:
         checkpoint_file_path = f"{CHECKPOINTS_PATH}/tempsal_temporal.ckpt"
         if not os.path.exists(checkpoint_file_path):
@@ -155,6 +167,7 @@ def main() -> None:
             weight_decay=weight_decay,
             name="tempsal",
             dataset="salicon",
+            with_compile=with_compile,
         )
         print(f"✅ Loaded temporal model from {Path(checkpoint_file_path).resolve()}.")
     else:
@@ -164,6 +177,7 @@ def main() -> None:
             weight_decay=weight_decay,
             name="tempsal",
             dataset="salicon",
+            with_compile=with_compile,
         )
 
     # Get trainer and train
@@ -174,6 +188,7 @@ def main() -> None:
         config=config,
     )
 
+    callbacks = [TQDMProgressBar(refresh_rate=PROGRESS_BAR_REFRESH_RATE)]
     if save_model:
         checkpoint_callback = ModelCheckpoint(
             dirpath=f"{MODELS_PATH}/tempsal/{wandb_name}",
@@ -182,9 +197,7 @@ def main() -> None:
             monitor="val_loss",
             mode="min",
         )
-        callbacks = [checkpoint_callback]
-    else:
-        callbacks = []
+        callbacks.append(checkpoint_callback)
 
     trainer = pl.Trainer(
         max_epochs=n_epochs,
@@ -196,6 +209,7 @@ def main() -> None:
         val_check_interval=evaluation_steps,
         logger=wandb_logger,
         callbacks=callbacks,
+        plugins=[AsyncCheckpointIO()],
     )
 
     trainer.fit(
@@ -0,0 +1,17 @@
+import os
+import torch
+
+from src.config import INDUCTOR_CACHE_PATH
+
+
+def set_backends() -> None:
+    """
+    Set the PyTorch backends up for training, enabling the cuDNN autotuner and TF32 matrix multiplications and
+    convolutions, and caching compiled kernels on disk to skip most of the compilation in later runs.
+    """
+    torch.backends.cudnn.benchmark = True
+    torch.set_float32_matmul_precision("high")
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", INDUCTOR_CACHE_PATH)
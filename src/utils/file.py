@@ -4,9 +4,18 @@ from pathlib import Path
 GLOBAL_DIR = Path(__file__).parent / ".."
 sys.path.append(str(GLOBAL_DIR))
 
+import os
+from fnmatch import fnmatch
 from typing import List, Tuple
 from pathlib import Path
 
+SET_STR_TO_ID = {
+    "videos": 0,
+    "images": 1,
+    "clear": 0,
+    "overcast": 1,
+}
+
 def get_paths_recursive(
     folder_path: str,
     match_pattern: str,
@@ -30,20 +39,21 @@ def get_paths_recursive(
             f"❌ Invalid file type {path_type}. Must be None, 'f', or 'd'."
         )
 
-    # Define search method and get paths
-    search_method = Path(folder_path).rglob if recursive else Path(folder_path).glob
-    paths = list(search_method(match_pattern))
-
-    # Filter and resolve paths
-    paths = [
-        path.resolve().as_posix()
-        for path in paths
-        if (
-            path_type is None
-            or (path_type == "f" and path.is_file())
-            or (path_type == "d" and path.is_dir())
-        )
-    ]
+    # Walk the folder in a single pass, which already separates files from folders so that paths do not have to be
+    # checked one by one. The folder is resolved once so that the matched paths are already absolute
+    folder_path = Path(folder_path).resolve()
+    paths = []
+    for root, dir_names, file_names in os.walk(folder_path):
+        root = Path(root).as_posix()
+        names = []
+        if path_type in [None, "d"]:
+            names += dir_names
+        if path_type in [None, "f"]:
+            names += file_names
+        paths += [f"{root}/{name}" for name in names if fnmatch(name, match_pattern)]
+
+        if not recursive:
+            break
 
     return paths
 
@@ -100,14 +110,8 @@ def get_set_id_from_file_path(file_path: str) -> str:
         str: The set string
     """
     set_str = file_path.split("/")[-2]
-    set_str_to_id = {
-        "videos": 0,
-        "images": 1,
-        "clear": 0,
-        "overcast": 1,
-    }
 
-    return set_str_to_id[set_str]
+    return SET_STR_TO_ID[set_str]
 
 
 def get_scene_id_from_file_path(file_path: str) -> int:
@@ -135,8 +139,10 @@ def get_ids_from_file_path(file_path: str) -> Tuple[int, int, int]:
         int: The set ID.
         int: The scene ID.
     """
-    experiment_id = get_experiment_id_from_file_path(file_path)
-    set_id = get_set_id_from_file_path(file_path)
-    scene_id = get_scene_id_from_file_path(file_path)
+    # Split the path once for all ids
+    experiment_str, set_str, scene_str = file_path.split("/")[-3:]
+    experiment_id = int(experiment_str.split("experiment")[-1])
+    set_id = SET_STR_TO_ID[set_str]
+    scene_id = int(scene_str.split("scene")[-1].split(".")[0])
 
     return experiment_id, set_id, scene_id